@@ -16,13 +16,21 @@ import logging
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 
-from autogen_agentchat.agents import AssistantAgent, MessageFilterAgent, MessageFilterConfig, PerSourceFilter
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+from autogen_agentchat.agents import AssistantAgent, MessageFilterConfig, PerSourceFilter
 from autogen_agentchat.teams import DiGraphBuilder, GraphFlow
 from autogen_agentchat.conditions import TextMentionTermination, MaxMessageTermination
 from autogen_agentchat.ui import Console
 
 from env_config import get_config, EnvironmentConfig
 from gemini_client import create_model_client
+from llm_cache import CachedChatCompletionClient
+from message_filter import IndexedMessageFilterAgent
 
 
 @dataclass
@@ -36,9 +44,58 @@ class AdvancedProgrammingTask:
     performance_requirements: List[str] = None
 
 
+# 任务提示的固定片段（模块级常量，每次任务复用）
+_TASK_PROMPT_HEADER = "请按照工作流程协作完成任务，确保代码质量、安全性和可维护性。\n"
+
+
+def _message_text(message) -> str:
+    """提取消息的文本内容（用于条件边判断）"""
+    to_model_text = getattr(message, 'to_model_text', None)
+    if to_model_text is not None:
+        return to_model_text()
+    return str(getattr(message, 'content', ''))
+
+
+def _review_approved(message) -> bool:
+    """审阅消息中包含APPROVE时为真"""
+    return "APPROVE" in _message_text(message)
+
+
+def _review_not_approved(message) -> bool:
+    """审阅消息中不包含APPROVE时为真"""
+    return "APPROVE" not in _message_text(message)
+
+
 class AdvancedProgrammingWorkflow:
     """AutoGen高级编程工作流主类"""
 
+    # 静态工作流拓扑（类级常量，三元组为 源节点、目标节点、条件）
+    # 图结构固定，在类级别定义一次，实例化时只需按名称绑定各自的Agent
+    # 并行模式：CodeReviewer和SecurityAnalyzer从CodeWriter扇出后在CodeOptimizer汇聚；
+    # 审阅直接通过（APPROVE）时旁路直达最终验证，省去优化和测试两次LLM调用
+    _PARALLEL_EDGES = (
+        ('code_writer', 'code_reviewer', None),
+        ('code_writer', 'security_analyzer', None),
+        ('code_reviewer', 'code_optimizer', _review_not_approved),
+        ('security_analyzer', 'code_optimizer', None),
+        ('code_optimizer', 'test_generator', None),
+        ('test_generator', 'final_validator', None),
+        ('code_reviewer', 'final_validator', _review_approved),
+    )
+    # 并行拓扑中的汇聚节点：默认激活方式"all"要求所有入边都
+    # 触发，而这两个节点的入边包含互斥的条件边（审阅通过/不通过
+    # 只会走其一），"all"下永远无法激活；入边改为"any"，任一
+    # 入边触发即执行，保证两种审阅结果下FinalValidator都会收尾
+    _ANY_ACTIVATION_NODES = frozenset({'code_optimizer', 'final_validator'})
+    # 串行模式：各节点依次执行（无条件边）
+    _SERIAL_EDGES = (
+        ('code_writer', 'code_reviewer', None),
+        ('code_reviewer', 'security_analyzer', None),
+        ('security_analyzer', 'code_optimizer', None),
+        ('code_optimizer', 'test_generator', None),
+        ('test_generator', 'final_validator', None),
+    )
+
     def __init__(self, config: Optional[EnvironmentConfig] = None):
         """初始化高级编程工作流"""
         # 加载配置
@@ -52,15 +109,37 @@ class AdvancedProgrammingWorkflow:
         # 创建模型客户端
         self.model_client = create_model_client(self.config.api)
 
+        # 启用响应缓存（如果配置）
+        if self.config.cache.enable_cache:
+            self.model_client = CachedChatCompletionClient(
+                self.model_client,
+                model=self.config.api.model,
+                temperature=self.config.api.temperature,
+                expiry_hours=self.config.cache.expiry_hours
+            )
+
         # 设置日志
         self.logger = logging.getLogger(__name__)
-        
-        # 创建所有Agent
-        self.agents = self._create_all_agents()
-        
-        # 构建工作流图
-        self.graph_flow = self._build_workflow_graph()
-    
+
+        # Agent和工作流图延迟创建，首次访问时才构建
+        # 避免在只做配置检查或提前终止的场景下白白分配六个Agent
+        self._agents: Optional[Dict[str, AssistantAgent]] = None
+        self._graph_flow: Optional[GraphFlow] = None
+
+    @property
+    def agents(self) -> Dict[str, AssistantAgent]:
+        """所有Agent（首次访问时创建并缓存）"""
+        if self._agents is None:
+            self._agents = self._create_all_agents()
+        return self._agents
+
+    @property
+    def graph_flow(self) -> GraphFlow:
+        """工作流图（首次访问时构建并缓存）"""
+        if self._graph_flow is None:
+            self._graph_flow = self._build_workflow_graph()
+        return self._graph_flow
+
     def _create_all_agents(self) -> Dict[str, AssistantAgent]:
         """创建所有需要的Agent"""
         agents = {}
@@ -141,7 +220,7 @@ class AdvancedProgrammingWorkflow:
         )
         
         # 使用消息过滤，只接收来自审阅者和安全分析师的最新消息
-        agents['code_optimizer'] = MessageFilterAgent(
+        agents['code_optimizer'] = IndexedMessageFilterAgent(
             name="CodeOptimizer",
             wrapped_agent=optimizer_core,
             filter=MessageFilterConfig(
@@ -188,7 +267,7 @@ class AdvancedProgrammingWorkflow:
         )
         
         # 最终验证Agent只接收关键消息
-        agents['final_validator'] = MessageFilterAgent(
+        agents['final_validator'] = IndexedMessageFilterAgent(
             name="FinalValidator",
             wrapped_agent=final_validator_core,
             filter=MessageFilterConfig(
@@ -205,25 +284,49 @@ class AdvancedProgrammingWorkflow:
     def _build_workflow_graph(self) -> GraphFlow:
         """构建工作流图"""
         builder = DiGraphBuilder()
+
+        # 批量添加所有节点
+        # DiGraphBuilder提供批量API时优先使用（跳过逐次的图不变量检查），
+        # 否则退回逐个添加
+        agents = list(self.agents.values())
+        add_nodes = getattr(builder, 'add_nodes', None)
+        if add_nodes is not None:
+            add_nodes(agents)
+        else:
+            for agent in agents:
+                builder.add_node(agent)
         
-        # 添加所有节点
-        for agent in self.agents.values():
-            builder.add_node(agent)
-        
-        # 定义工作流边
-        # 1. CodeWriter -> CodeReviewer 和 SecurityAnalyzer (并行)
-        builder.add_edge(self.agents['code_writer'], self.agents['code_reviewer'])
-        builder.add_edge(self.agents['code_writer'], self.agents['security_analyzer'])
-        
-        # 2. CodeReviewer 和 SecurityAnalyzer -> CodeOptimizer (汇聚)
-        builder.add_edge(self.agents['code_reviewer'], self.agents['code_optimizer'])
-        builder.add_edge(self.agents['security_analyzer'], self.agents['code_optimizer'])
-        
-        # 3. CodeOptimizer -> TestGenerator
-        builder.add_edge(self.agents['code_optimizer'], self.agents['test_generator'])
-        
-        # 4. TestGenerator -> FinalValidator
-        builder.add_edge(self.agents['test_generator'], self.agents['final_validator'])
+        # 按类级拓扑常量添加工作流边
+        # 并行模式下CodeReviewer和SecurityAnalyzer的入边同时就绪，
+        # GraphFlow会并发调度它们，两次LLM调用的耗时从相加变为取最大值
+        if self.config.workflow.enable_parallel_processing:
+            edges = self._PARALLEL_EDGES
+            any_nodes = self._ANY_ACTIVATION_NODES
+        else:
+            edges = self._SERIAL_EDGES
+            any_nodes = frozenset()
+
+        # 无条件、非汇聚的普通边批量添加（同样优先使用批量API）；
+        # 带条件或指向汇聚节点的边逐条添加以传递各自的参数
+        edge_pairs = []
+        for source, target, condition in edges:
+            kwargs = {}
+            if condition is not None:
+                kwargs['condition'] = condition
+            if target in any_nodes:
+                kwargs['activation_condition'] = 'any'
+
+            if kwargs:
+                builder.add_edge(self.agents[source], self.agents[target], **kwargs)
+            else:
+                edge_pairs.append((self.agents[source], self.agents[target]))
+
+        add_edges = getattr(builder, 'add_edges', None)
+        if add_edges is not None:
+            add_edges(edge_pairs)
+        else:
+            for source_agent, target_agent in edge_pairs:
+                builder.add_edge(source_agent, target_agent)
         
         # 构建图
         graph = builder.build()
@@ -234,6 +337,58 @@ class AdvancedProgrammingWorkflow:
             graph=graph
         )
     
+    async def _stream_with_backpressure(self, stream, maxsize: int = 64):
+        """以有界队列转发流式输出
+
+        生产者任务把消息送入asyncio.Queue并在队列满时自动阻塞，
+        消费者边取边yield，形成背压而不是把整个流缓冲到结束
+
+        Args:
+            stream: 工作流运行产生的异步消息流
+            maxsize: 队列上限
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        sentinel = object()
+
+        async def _pump():
+            try:
+                async for item in stream:
+                    await queue.put(item)
+            finally:
+                await queue.put(sentinel)
+
+        pump_task = asyncio.create_task(_pump())
+        try:
+            while True:
+                item = await queue.get()
+                if item is sentinel:
+                    break
+                yield item
+            # 传播生产者侧的异常
+            await pump_task
+        finally:
+            if not pump_task.done():
+                pump_task.cancel()
+
+    async def _consume_stream(self, stream) -> None:
+        """消费消息流并在异常时确定性回收客户端连接
+
+        Args:
+            stream: 工作流运行产生的异步消息流
+        """
+        try:
+            if hasattr(asyncio, 'TaskGroup'):
+                # Python 3.11+：结构化并发，异常时自动取消组内任务
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(Console(self._stream_with_backpressure(stream)))
+            else:
+                await Console(self._stream_with_backpressure(stream))
+        except BaseException:
+            # 出错时立即关闭模型客户端，回收在途HTTP请求避免套接字泄漏
+            self.logger.error("工作流执行异常，关闭模型客户端连接")
+            await self.model_client.close()
+            raise
+
     async def run_advanced_task(self, task: AdvancedProgrammingTask) -> None:
         """执行高级编程任务"""
         
@@ -256,40 +411,42 @@ class AdvancedProgrammingWorkflow:
         
         # 运行工作流
         stream = self.graph_flow.run_stream(task=task_description)
-        await Console(stream)
+        await self._consume_stream(stream)
         
         print("\n" + "=" * 80)
         print("✅ 高级编程工作流完成！")
     
     def _build_task_description(self, task: AdvancedProgrammingTask) -> str:
-        """构建任务描述"""
-        description = f"""
-高级编程任务：{task.description}
+        """构建任务描述
 
-基本要求：
-{chr(10).join(f"- {req}" for req in task.requirements)}
+        固定的流程说明放在前缀、任务相关的动态字段放在末尾，
+        保持提示前缀字节一致以便提供商侧的提示缓存命中；
+        片段列表一次join，避免多段f-string拼接的中间字符串分配
+        """
+        parts = [
+            _TASK_PROMPT_HEADER,
+            "\n高级编程任务：", task.description,
+            "\n\n基本要求：\n", "\n".join(f"- {req}" for req in task.requirements),
+            "\n\n编程语言：", task.language,
+            "\n复杂度级别：", task.complexity_level,
+            "\n",
+        ]
 
-编程语言：{task.language}
-复杂度级别：{task.complexity_level}
-"""
-        
         if task.security_requirements:
-            description += f"""
-安全要求：
-{chr(10).join(f"- {req}" for req in task.security_requirements)}
-"""
-        
+            parts += [
+                "\n安全要求：\n",
+                "\n".join(f"- {req}" for req in task.security_requirements),
+                "\n",
+            ]
+
         if task.performance_requirements:
-            description += f"""
-性能要求：
-{chr(10).join(f"- {req}" for req in task.performance_requirements)}
-"""
-        
-        description += """
-请按照工作流程协作完成任务，确保代码质量、安全性和可维护性。
-"""
-        
-        return description
+            parts += [
+                "\n性能要求：\n",
+                "\n".join(f"- {req}" for req in task.performance_requirements),
+                "\n",
+            ]
+
+        return "".join(parts)
     
     async def close(self):
         """关闭模型客户端连接"""
@@ -338,4 +495,8 @@ async def main():
 
 
 if __name__ == "__main__":
+    # 使用uvloop事件循环（如果已安装），降低协程调度开销
+    if UVLOOP_AVAILABLE:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     asyncio.run(main())
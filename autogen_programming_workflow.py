@@ -14,13 +14,28 @@ import logging
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.conditions import TextMentionTermination, MaxMessageTermination
 from autogen_agentchat.ui import Console
 
+from code_blob import blob_store
+from config import get_agent_config
 from env_config import get_config, EnvironmentConfig
 from gemini_client import create_model_client
+from llm_cache import CachedChatCompletionClient
 
 
 @dataclass
@@ -30,6 +45,98 @@ class ProgrammingTask:
     requirements: List[str]
     language: str = "python"
 
+    def to_prompt(self) -> str:
+        """序列化为单个批量提示
+
+        全部需求合并进一个需求清单段落，整条任务只触发一次
+        模型往返，而不是每条需求一次。固定的流程说明放在前缀、
+        动态字段放在末尾，保持提示前缀字节一致以便提供商侧的
+        提示缓存命中；片段列表一次join，避免多段f-string的
+        中间字符串分配
+        """
+        return "".join([
+            _TASK_PROMPT_HEADER,
+            "\n编程任务：", self.description,
+            "\n\n要求：\n", "\n".join(f"- {req}" for req in self.requirements),
+            "\n\n编程语言：", self.language,
+            "\n\n开始工作！\n",
+        ])
+
+
+# 任务提示的固定片段（模块级常量，每次任务复用）
+_TASK_PROMPT_HEADER = """请按照以下流程协作完成编程任务：
+1. CodeWriter: 根据需求编写代码
+2. CodeReviewer: 审阅代码并提出改进建议
+3. CodeOptimizer: 根据审阅意见优化代码
+"""
+
+
+class AsyncBatcher:
+    """把零散到达的条目聚合成批的小工具
+
+    条目通过add进入待处理队列，凑满max_items或等待timeout后
+    作为一个批次整体交给处理函数（例如客户端的create_batch），
+    把N次独立的模型往返合并为一次批量调用。供未来的流式输入
+    路径使用；当前的run_programming_task已在to_prompt中一次性
+    批量全部需求，无需经过它
+    """
+
+    def __init__(self, handler, timeout: float = 0.1, max_items: int = 8):
+        """
+        初始化批处理器
+
+        Args:
+            handler: 接收条目列表、返回等长结果列表的异步函数
+            timeout: 批次等待窗口（秒）
+            max_items: 单批最大条目数，到达即立即触发
+        """
+        self._handler = handler
+        self._timeout = timeout
+        self._max_items = max_items
+        self._pending: list = []  # [(条目, Future), ...]
+        self._timer: Optional[asyncio.Task] = None
+
+    async def add(self, item):
+        """提交一个条目，返回它在所属批次中的处理结果"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self._max_items:
+            await self._flush()
+        elif self._timer is None:
+            # 启动等待窗口，窗口结束后整批提交
+            self._timer = loop.create_task(self._delayed_flush())
+
+        return await future
+
+    async def _delayed_flush(self):
+        """等待窗口结束后提交当前批次"""
+        await asyncio.sleep(self._timeout)
+        await self._flush()
+
+    async def _flush(self):
+        """把累积的条目作为一个批次交给处理函数"""
+        timer, self._timer = self._timer, None
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        try:
+            results = await self._handler([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
 
 class ProgrammingWorkflow:
     """AutoGen编程工作流主类"""
@@ -52,9 +159,18 @@ class ProgrammingWorkflow:
         # 创建模型客户端
         self.model_client = create_model_client(self.config.api)
 
+        # 启用响应缓存（如果配置）
+        if self.config.cache.enable_cache:
+            self.model_client = CachedChatCompletionClient(
+                self.model_client,
+                model=self.config.api.model,
+                temperature=self.config.api.temperature,
+                expiry_hours=self.config.cache.expiry_hours
+            )
+
         # 设置日志
         self.logger = logging.getLogger(__name__)
-        
+
         # 创建三个专门的Agent
         self.code_writer = self._create_code_writer_agent()
         self.code_reviewer = self._create_code_reviewer_agent()
@@ -68,90 +184,36 @@ class ProgrammingWorkflow:
     
     def _create_code_writer_agent(self) -> AssistantAgent:
         """创建代码编写Agent"""
-        system_message = """你是一个专业的代码编写专家。你的职责是：
+        # 系统消息统一从config.py读取，保证各处字节一致以便提示缓存命中
+        agent_config = get_agent_config("code_writer")
 
-1. 根据用户需求编写高质量的代码
-2. 确保代码功能完整、逻辑清晰
-3. 添加必要的注释和文档字符串
-4. 遵循最佳编程实践
-
-编写代码时请：
-- 使用清晰的变量和函数命名
-- 添加适当的错误处理
-- 包含必要的导入语句
-- 提供使用示例
-
-完成代码编写后，请说明代码的主要功能和使用方法。
-"""
-        
         return AssistantAgent(
-            name="CodeWriter",
+            name=agent_config.name,
             model_client=self.model_client,
-            system_message=system_message,
-            description="专业的代码编写专家，负责根据需求编写高质量代码"
+            system_message=agent_config.system_message,
+            description=agent_config.description
         )
-    
+
     def _create_code_reviewer_agent(self) -> AssistantAgent:
         """创建代码审阅Agent"""
-        system_message = """你是一个资深的代码审阅专家。你的职责是：
-
-1. 仔细审阅提供的代码
-2. 检查代码的正确性、效率和安全性
-3. 提出具体的改进建议
-4. 评估代码是否符合最佳实践
-
-审阅时请关注：
-- 代码逻辑是否正确
-- 是否存在潜在的bug或安全问题
-- 代码效率和性能
-- 可读性和维护性
-- 错误处理是否充分
-- 是否遵循编程规范
-
-请提供详细的审阅报告，包括：
-- 发现的问题
-- 改进建议
-- 代码质量评分（1-10分）
-
-如果代码质量很高，可以说"APPROVE"表示通过审阅。
-"""
-        
+        agent_config = get_agent_config("code_reviewer")
+
         return AssistantAgent(
-            name="CodeReviewer", 
+            name=agent_config.name,
             model_client=self.model_client,
-            system_message=system_message,
-            description="资深代码审阅专家，负责审阅代码质量并提出改进建议"
+            system_message=agent_config.system_message,
+            description=agent_config.description
         )
-    
+
     def _create_code_optimizer_agent(self) -> AssistantAgent:
         """创建代码优化Agent"""
-        system_message = """你是一个代码优化专家。你的职责是：
-
-1. 分析原始代码和审阅意见
-2. 根据审阅建议优化代码
-3. 提升代码的性能、可读性和维护性
-4. 确保优化后的代码功能完整
-
-优化时请：
-- 修复审阅中指出的问题
-- 改进代码结构和算法效率
-- 增强错误处理和边界条件检查
-- 优化代码风格和注释
-- 保持原有功能不变
-
-请提供：
-- 优化后的完整代码
-- 优化说明和改进点总结
-- 性能提升预期
-
-完成优化后请说"OPTIMIZATION_COMPLETE"表示工作完成。
-"""
-        
+        agent_config = get_agent_config("code_optimizer")
+
         return AssistantAgent(
-            name="CodeOptimizer",
-            model_client=self.model_client, 
-            system_message=system_message,
-            description="代码优化专家，负责根据审阅意见优化和改进代码"
+            name=agent_config.name,
+            model_client=self.model_client,
+            system_message=agent_config.system_message,
+            description=agent_config.description
         )
     
     def _create_termination_condition(self):
@@ -171,6 +233,58 @@ class ProgrammingWorkflow:
             termination_condition=self.termination_condition
         )
     
+    async def _stream_with_backpressure(self, stream, maxsize: int = 64):
+        """以有界队列转发流式输出
+
+        生产者任务把消息送入asyncio.Queue并在队列满时自动阻塞，
+        消费者边取边yield，形成背压而不是把整个流缓冲到结束
+
+        Args:
+            stream: 团队运行产生的异步消息流
+            maxsize: 队列上限
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        sentinel = object()
+
+        async def _pump():
+            try:
+                async for item in stream:
+                    await queue.put(item)
+            finally:
+                await queue.put(sentinel)
+
+        pump_task = asyncio.create_task(_pump())
+        try:
+            while True:
+                item = await queue.get()
+                if item is sentinel:
+                    break
+                yield item
+            # 传播生产者侧的异常
+            await pump_task
+        finally:
+            if not pump_task.done():
+                pump_task.cancel()
+
+    async def _consume_stream(self, stream) -> None:
+        """消费消息流并在异常时确定性回收客户端连接
+
+        Args:
+            stream: 团队运行产生的异步消息流
+        """
+        try:
+            if hasattr(asyncio, 'TaskGroup'):
+                # Python 3.11+：结构化并发，异常时自动取消组内任务
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(Console(self._stream_with_backpressure(stream)))
+            else:
+                await Console(self._stream_with_backpressure(stream))
+        except BaseException:
+            # 出错时立即关闭模型客户端，回收在途HTTP请求避免套接字泄漏
+            self.logger.error("工作流执行异常，关闭模型客户端连接")
+            await self.model_client.close()
+            raise
+
     async def run_programming_task(self, task: ProgrammingTask) -> None:
         """
         执行编程任务
@@ -178,22 +292,8 @@ class ProgrammingWorkflow:
         Args:
             task: 编程任务对象
         """
-        # 构建任务描述
-        task_description = f"""
-编程任务：{task.description}
-
-要求：
-{chr(10).join(f"- {req}" for req in task.requirements)}
-
-编程语言：{task.language}
-
-请按照以下流程协作完成：
-1. CodeWriter: 根据需求编写代码
-2. CodeReviewer: 审阅代码并提出改进建议  
-3. CodeOptimizer: 根据审阅意见优化代码
-
-开始工作！
-"""
+        # 构建任务描述：全部需求批量进一条首消息（见to_prompt）
+        task_description = task.to_prompt()
         
         self.logger.info("启动AutoGen编程工作流")
 
@@ -211,7 +311,7 @@ class ProgrammingWorkflow:
         # 运行团队协作
         self.logger.info("开始团队协作")
         stream = self.team.run_stream(task=task_description)
-        await Console(stream)
+        await self._consume_stream(stream)
 
         # 保存中间结果（如果启用）
         if self.config.project.save_intermediate_results:
@@ -231,10 +331,13 @@ class ProgrammingWorkflow:
         results_dir = self.config.project.results_dir
         os.makedirs(results_dir, exist_ok=True)
 
-        # 生成文件名
+        # 所有运行追加到同一个JSONL文件，避免每次运行新建文件
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"programming_task_{timestamp}.json"
-        filepath = os.path.join(results_dir, filename)
+        filepath = os.path.join(results_dir, "programming_tasks.jsonl")
+
+        # 任务描述按内容哈希去重：同一进程内重复出现的全文只写一次，
+        # 后续记录仅携带blob引用
+        blob_id, first_seen = blob_store.put(task_description)
 
         # 保存任务信息
         result_data = {
@@ -244,7 +347,7 @@ class ProgrammingWorkflow:
                 "requirements": task.requirements,
                 "language": task.language
             },
-            "task_description": task_description,
+            "task_description_ref": blob_id,
             "config": {
                 "provider": self.config.api.provider,
                 "model": self.config.api.model,
@@ -253,10 +356,21 @@ class ProgrammingWorkflow:
             }
         }
 
+        # 全文只随首次出现的记录写入，之后的记录通过引用解析
+        if first_seen:
+            result_data["task_description"] = task_description
+
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"结果已保存到: {filepath}")
+            # 单行紧凑JSON追加写入，配合大缓冲减少磁盘写入量
+            # 优先使用orjson（C实现序列化器），未安装时退回标准库json
+            if ORJSON_AVAILABLE:
+                line = orjson.dumps(result_data).decode('utf-8')
+            else:
+                line = json.dumps(result_data, ensure_ascii=False)
+
+            with open(filepath, 'a', encoding='utf-8', buffering=1 << 16) as f:
+                f.write(line + '\n')
+            self.logger.info(f"结果已追加到: {filepath}")
         except Exception as e:
             self.logger.error(f"保存结果失败: {e}")
 
@@ -301,5 +415,9 @@ async def main():
 
 
 if __name__ == "__main__":
+    # 使用uvloop事件循环（如果已安装），降低协程调度开销
+    if UVLOOP_AVAILABLE:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     # 运行主程序
     asyncio.run(main())
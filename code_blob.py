@@ -0,0 +1,46 @@
+"""
+代码Blob存储模块
+以内容哈希为键去重存储代码和任务文本
+同一份大文本在进程内只保留一份，各处通过短引用共享
+"""
+
+import hashlib
+from typing import Dict, Optional, Tuple
+
+
+class CodeBlobStore:
+    """进程内的内容寻址Blob存储
+
+    put返回内容的SHA-256短引用，相同内容只存储一份；
+    get按引用取回原文。用于在结果记录等链路中以blob引用
+    替代重复出现的代码全文
+    """
+
+    def __init__(self):
+        self._blobs: Dict[str, str] = {}
+
+    def put(self, text: str) -> Tuple[str, bool]:
+        """存入文本并返回其引用
+
+        Args:
+            text: 要存储的文本
+
+        Returns:
+            (blob引用, 是否为首次存入)
+        """
+        blob_id = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+        created = blob_id not in self._blobs
+        if created:
+            self._blobs[blob_id] = text
+        return blob_id, created
+
+    def get(self, blob_id: str) -> Optional[str]:
+        """按引用取回文本，不存在时返回None"""
+        return self._blobs.get(blob_id)
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+
+# 进程内共享实例
+blob_store = CodeBlobStore()
@@ -3,11 +3,13 @@ AutoGen编程工作流配置文件
 包含模型配置、Agent配置和工作流参数设置
 """
 
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True)
 class ModelConfig:
     """模型配置"""
     name: str = "gpt-4o"
@@ -17,7 +19,7 @@ class ModelConfig:
     timeout: int = 60
 
 
-@dataclass 
+@dataclass(frozen=True)
 class AgentConfig:
     """Agent配置"""
     name: str
@@ -26,7 +28,7 @@ class AgentConfig:
     tools: List[str] = None
 
 
-@dataclass
+@dataclass(frozen=True)
 class WorkflowConfig:
     """工作流配置"""
     max_messages: int = 15
@@ -284,21 +286,28 @@ class ProgrammingWorkflowConfig:
     }
 
 
-# 获取配置的便捷函数
+# 基础和高级Agent配置在导入时合并一次，查询时直接O(1)命中
+# MappingProxyType保证合并结果只读
+_ALL_AGENTS = MappingProxyType({
+    **ProgrammingWorkflowConfig.BASIC_AGENTS,
+    **ProgrammingWorkflowConfig.ADVANCED_AGENTS
+})
+
+
+# 获取配置的便捷函数（lru_cache保证重复查询为O(1)字典命中）
+@lru_cache(maxsize=None)
 def get_model_config() -> ModelConfig:
     """获取模型配置"""
     return ProgrammingWorkflowConfig.MODEL_CONFIG
 
 
+@lru_cache(maxsize=None)
 def get_agent_config(agent_name: str) -> Optional[AgentConfig]:
     """获取指定Agent的配置"""
-    all_agents = {
-        **ProgrammingWorkflowConfig.BASIC_AGENTS,
-        **ProgrammingWorkflowConfig.ADVANCED_AGENTS
-    }
-    return all_agents.get(agent_name)
+    return _ALL_AGENTS.get(agent_name)
 
 
+@lru_cache(maxsize=None)
 def get_workflow_config(workflow_type: str = "basic") -> WorkflowConfig:
     """获取工作流配置"""
     if workflow_type == "advanced":
@@ -306,11 +315,13 @@ def get_workflow_config(workflow_type: str = "basic") -> WorkflowConfig:
     return ProgrammingWorkflowConfig.BASIC_WORKFLOW_CONFIG
 
 
+@lru_cache(maxsize=None)
 def get_language_config(language: str) -> Optional[Dict]:
     """获取编程语言配置"""
     return ProgrammingWorkflowConfig.SUPPORTED_LANGUAGES.get(language.lower())
 
 
+@lru_cache(maxsize=None)
 def get_complexity_config(level: str) -> Optional[Dict]:
     """获取复杂度配置"""
     return ProgrammingWorkflowConfig.COMPLEXITY_LEVELS.get(level.lower())
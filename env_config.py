@@ -3,54 +3,115 @@ AutoGen编程工作流环境配置管理模块
 支持从.env文件和环境变量加载配置
 """
 
+import atexit
 import os
 import logging
-from typing import Optional, Dict, Any, List
+import logging.handlers
+import pickle
+import queue
+from functools import cached_property
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Mapping
 from dataclasses import dataclass
 from pathlib import Path
 
 
-def load_env_file(env_path: str = ".env") -> Dict[str, str]:
+# 布尔环境变量的真值集合：frozenset成员判断为O(1)哈希查找
+_TRUE_VALUES = frozenset(('true', '1', 'yes', 'on'))
+
+# 跳过.env解析时返回的只读空映射单例
+_EMPTY_ENV: Mapping[str, str] = MappingProxyType({})
+
+
+def load_env_file(env_path: str = ".env") -> Mapping[str, str]:
     """
     加载.env文件
-    
+
     Args:
         env_path: .env文件路径
-        
+
     Returns:
         配置字典
     """
+    # 容器/CI场景下所有配置已由启动器注入os.environ，
+    # 设置SKIP_DOTENV时完全跳过文件读取与解析
+    if os.environ.get('SKIP_DOTENV'):
+        return _EMPTY_ENV
+
     env_vars = {}
-    
-    if not os.path.exists(env_path):
+
+    try:
+        source_stat = os.stat(env_path)
+    except OSError:
         return env_vars
-    
+
+    # 尝试读取编译好的.pkl旁路缓存：源文件未变时直接反序列化，
+    # 跳过逐行正则解析
+    header = (source_stat.st_mtime_ns, source_stat.st_size)
+    pkl_path = env_path + '.pkl'
     try:
-        with open(env_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                
-                # 跳过空行和注释
-                if not line or line.startswith('#'):
-                    continue
-                
-                # 解析键值对
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip()
-                    
-                    # 移除引号
-                    if value.startswith('"') and value.endswith('"'):
-                        value = value[1:-1]
-                    elif value.startswith("'") and value.endswith("'"):
-                        value = value[1:-1]
-                    
-                    env_vars[key] = value
-    
+        with open(pkl_path, 'rb') as f:
+            cached_header, cached_vars = pickle.load(f)
+        if cached_header == header:
+            return cached_vars
+    except (OSError, pickle.PickleError, ValueError, EOFError):
+        pass
+
+    try:
+        # 整体按字节读入并按字节扫描，只对最终的键和值做一次解码，
+        # 避免逐行unicode处理的开销
+        with open(env_path, 'rb') as f:
+            data = f.read()
+
+        for raw_line in data.splitlines():
+            line = raw_line.strip()
+            # 跳过空行和注释
+            if not line or line[:1] == b'#':
+                continue
+
+            eq = line.find(b'=')
+            if eq < 0:
+                continue
+
+            key = line[:eq].strip()
+            if not key:
+                continue
+
+            value = line[eq + 1:].strip()
+            # 剥离成对的包围引号
+            if (
+                len(value) >= 2
+                and value[:1] == value[-1:]
+                and value[:1] in (b'"', b"'")
+            ):
+                value = value[1:-1]
+
+            env_vars[key.decode('utf-8')] = value.decode('utf-8')
+
     except Exception as e:
         print(f"⚠️  加载.env文件失败: {e}")
-    
+        return env_vars
+
+    # 写回旁路缓存供下次冷启动使用（尽力而为，失败不影响本次加载）。
+    # 缓存里是.env的完整内容（含密钥），按源文件的权限位创建，
+    # 不能让默认umask把0600的配置泄漏成全局可读；先写临时文件
+    # 再原子替换，写入中断也不会留下半截pickle
+    tmp_path = pkl_path + '.tmp'
+    try:
+        fd = os.open(
+            tmp_path,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+            source_stat.st_mode & 0o777,
+        )
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((header, env_vars), f, protocol=5)
+        os.replace(tmp_path, pkl_path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
     return env_vars
 
 
@@ -79,7 +140,7 @@ def get_env_value(key: str, default: Any = None, env_vars: Optional[Dict[str, st
     
     # 类型转换
     if isinstance(default, bool):
-        return value.lower() in ('true', '1', 'yes', 'on')
+        return value.lower() in _TRUE_VALUES
     elif isinstance(default, int):
         try:
             return int(value)
@@ -96,7 +157,90 @@ def get_env_value(key: str, default: Any = None, env_vars: Optional[Dict[str, st
     return value
 
 
-@dataclass
+def _convert_value(value: str, default: Any) -> Any:
+    """按默认值的类型转换环境变量字符串（规则与get_env_value一致）"""
+    if isinstance(default, bool):
+        return value.lower() in _TRUE_VALUES
+    elif isinstance(default, int):
+        try:
+            return int(value)
+        except ValueError:
+            return default
+    elif isinstance(default, float):
+        try:
+            return float(value)
+        except ValueError:
+            return default
+    elif isinstance(default, list):
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    return value
+
+
+def _resolve(merged: Dict[str, str], key: str, default: Any = None) -> Any:
+    """从合并后的环境快照中取值并按默认值类型转换"""
+    value = merged.get(key)
+    if value is None:
+        return default
+    return _convert_value(value, default)
+
+
+def _resolve_schema(merged: Dict[str, str], schema: Dict[str, tuple]) -> Dict[str, Any]:
+    """按表批量解析环境变量
+
+    Args:
+        merged: 合并后的环境快照
+        schema: 字段名 -> (环境变量键, 默认值) 的映射表
+
+    Returns:
+        可直接展开给dataclass构造函数的参数字典
+    """
+    return {
+        field: _resolve(merged, key, default)
+        for field, (key, default) in schema.items()
+    }
+
+
+# 各配置组的环境变量表：字段名 -> (环境变量键, 默认值)
+_WORKFLOW_SCHEMA = {
+    "basic_max_messages": ("BASIC_WORKFLOW_MAX_MESSAGES", 15),
+    "advanced_max_messages": ("ADVANCED_WORKFLOW_MAX_MESSAGES", 25),
+    "enable_parallel_processing": ("ENABLE_PARALLEL_PROCESSING", True),
+    "enable_message_filtering": ("ENABLE_MESSAGE_FILTERING", True),
+    "enable_security_analysis": ("ENABLE_SECURITY_ANALYSIS", True),
+    "enable_performance_optimization": ("ENABLE_PERFORMANCE_OPTIMIZATION", True),
+    "security_check_level": ("SECURITY_CHECK_LEVEL", "standard"),
+    "performance_check_level": ("PERFORMANCE_CHECK_LEVEL", "standard"),
+}
+
+_LOGGING_SCHEMA = {
+    "level": ("LOG_LEVEL", "INFO"),
+    "verbose": ("VERBOSE_LOGGING", False),
+    "file_path": ("LOG_FILE", None),
+    "enable_color": ("ENABLE_COLOR_OUTPUT", True),
+}
+
+_PROJECT_SCHEMA = {
+    "name": ("PROJECT_NAME", "AutoGen Programming Workflow"),
+    "version": ("PROJECT_VERSION", "1.0.0"),
+    "default_language": ("DEFAULT_LANGUAGE", "python"),
+    "results_dir": ("RESULTS_DIR", "results"),
+    "debug_mode": ("DEBUG_MODE", False),
+    "save_intermediate_results": ("SAVE_INTERMEDIATE_RESULTS", False),
+}
+
+_CACHE_SCHEMA = {
+    "enable_cache": ("ENABLE_RESPONSE_CACHE", False),
+    "expiry_hours": ("CACHE_EXPIRY_HOURS", 24),
+}
+
+_PROXY_SCHEMA = {
+    "http_proxy": ("HTTP_PROXY", None),
+    "https_proxy": ("HTTPS_PROXY", None),
+}
+
+
+@dataclass(slots=True, frozen=True)
 class APIConfig:
     """API配置（支持OpenAI和Gemini）"""
     provider: str = "openai"  # openai, gemini
@@ -109,7 +253,7 @@ class APIConfig:
     timeout: int = 60
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class WorkflowConfig:
     """工作流配置"""
     basic_max_messages: int = 15
@@ -122,7 +266,7 @@ class WorkflowConfig:
     performance_check_level: str = "standard"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class LoggingConfig:
     """日志配置"""
     level: str = "INFO"
@@ -131,7 +275,7 @@ class LoggingConfig:
     enable_color: bool = True
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ProjectConfig:
     """项目配置"""
     name: str = "AutoGen Programming Workflow"
@@ -142,20 +286,41 @@ class ProjectConfig:
     save_intermediate_results: bool = False
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CacheConfig:
     """缓存配置"""
     enable_cache: bool = False
     expiry_hours: int = 24
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ProxyConfig:
     """代理配置"""
     http_proxy: Optional[str] = None
     https_proxy: Optional[str] = None
 
 
+class _ColorFormatter(logging.Formatter):
+    """在format()中注入ANSI颜色码的日志格式化器
+
+    旧格式串引用%(levelcolor)s但没有任何过滤器注入该字段，
+    每条记录都会触发Formatter的异常路径；这里在格式化时按
+    级别名查表补上字段，彻底消除这条隐藏的异常开销
+    """
+
+    _COLORS = {
+        'DEBUG': '34',
+        'INFO': '32',
+        'WARNING': '33',
+        'ERROR': '31',
+        'CRITICAL': '35',
+    }
+
+    def format(self, record):
+        record.levelcolor = self._COLORS.get(record.levelname, '0')
+        return super().format(record)
+
+
 class EnvironmentConfig:
     """环境配置管理器"""
     
@@ -168,14 +333,21 @@ class EnvironmentConfig:
         """
         self.env_file = env_file
         self.env_vars = load_env_file(env_file)
-        
-        # 加载各个配置模块
+
+        # 一次性合并.env与系统环境变量（系统环境优先），
+        # 后续所有字段解析都是对这一个字典的哈希命中
+        self._merged = {**self.env_vars, **os.environ}
+
+        # 各加载器在构建时就地校验并把错误收集到这里，
+        # validate_config只返回收集结果而不再二次遍历所有字段
+        self._errors: List[str] = []
+
+        # api配置立即加载（包含密钥校验）；
+        # logging/project在下面的初始化步骤中就会用到，同样立即加载；
+        # workflow/cache/proxy按需惰性构建（见cached_property）
         self.api = self._load_api_config()
-        self.workflow = self._load_workflow_config()
         self.logging = self._load_logging_config()
         self.project = self._load_project_config()
-        self.cache = self._load_cache_config()
-        self.proxy = self._load_proxy_config()
         
         # 设置日志
         self._setup_logging()
@@ -183,108 +355,137 @@ class EnvironmentConfig:
         # 创建必要的目录
         self._create_directories()
     
+    def _get(self, key: str, default: Any = None) -> Any:
+        """从合并快照读取环境值并按默认值类型转换
+
+        只查内存字典，不再逐次访问os.environ
+
+        Args:
+            key: 环境变量键
+            default: 默认值（同时决定转换类型）
+
+        Returns:
+            转换后的值
+        """
+        return _resolve(self._merged, key, default)
+
     def _load_api_config(self) -> APIConfig:
         """加载API配置（支持OpenAI和Gemini）"""
-        provider = get_env_value("API_PROVIDER", "openai", self.env_vars).lower()
+        provider = self._get("API_PROVIDER", "openai").lower()
 
         # 根据提供商获取API密钥
         if provider == "gemini":
-            api_key = get_env_value("GEMINI_API_KEY", env_vars=self.env_vars)
+            api_key = self._get("GEMINI_API_KEY")
             default_model = "gemini-pro"
-            base_url = get_env_value("GEMINI_BASE_URL", env_vars=self.env_vars)
+            base_url = self._get("GEMINI_BASE_URL")
         else:  # openai
-            api_key = get_env_value("OPENAI_API_KEY", env_vars=self.env_vars)
+            api_key = self._get("OPENAI_API_KEY")
             default_model = "gpt-4o"
-            base_url = get_env_value("OPENAI_BASE_URL", env_vars=self.env_vars)
+            base_url = self._get("OPENAI_BASE_URL")
 
         if not api_key:
             if provider == "gemini":
-                raise ValueError("GEMINI_API_KEY未设置，请在.env文件或环境变量中设置")
+                self._errors.append("GEMINI_API_KEY未设置")
             else:
-                raise ValueError("OPENAI_API_KEY未设置，请在.env文件或环境变量中设置")
+                self._errors.append("OPENAI_API_KEY未设置")
+
+        temperature = self._get("MODEL_TEMPERATURE", 0.1)
+        if temperature < 0 or temperature > 2:
+            self._errors.append("MODEL_TEMPERATURE必须在0-2之间")
 
         return APIConfig(
             provider=provider,
-            api_key=api_key,
+            api_key=api_key or "",
             base_url=base_url,
-            org_id=get_env_value("OPENAI_ORG_ID", env_vars=self.env_vars) if provider == "openai" else None,
-            model=get_env_value("DEFAULT_MODEL", default_model, self.env_vars),
-            temperature=get_env_value("MODEL_TEMPERATURE", 0.1, self.env_vars),
-            max_tokens=get_env_value("MAX_TOKENS", env_vars=self.env_vars),
-            timeout=get_env_value("REQUEST_TIMEOUT", 60, self.env_vars)
-        )
-    
-    def _load_workflow_config(self) -> WorkflowConfig:
-        """加载工作流配置"""
-        return WorkflowConfig(
-            basic_max_messages=get_env_value("BASIC_WORKFLOW_MAX_MESSAGES", 15, self.env_vars),
-            advanced_max_messages=get_env_value("ADVANCED_WORKFLOW_MAX_MESSAGES", 25, self.env_vars),
-            enable_parallel_processing=get_env_value("ENABLE_PARALLEL_PROCESSING", True, self.env_vars),
-            enable_message_filtering=get_env_value("ENABLE_MESSAGE_FILTERING", True, self.env_vars),
-            enable_security_analysis=get_env_value("ENABLE_SECURITY_ANALYSIS", True, self.env_vars),
-            enable_performance_optimization=get_env_value("ENABLE_PERFORMANCE_OPTIMIZATION", True, self.env_vars),
-            security_check_level=get_env_value("SECURITY_CHECK_LEVEL", "standard", self.env_vars),
-            performance_check_level=get_env_value("PERFORMANCE_CHECK_LEVEL", "standard", self.env_vars)
+            org_id=self._get("OPENAI_ORG_ID") if provider == "openai" else None,
+            model=self._get("DEFAULT_MODEL", default_model),
+            temperature=temperature,
+            max_tokens=self._get("MAX_TOKENS"),
+            timeout=self._get("REQUEST_TIMEOUT", 60)
         )
-    
+
     def _load_logging_config(self) -> LoggingConfig:
         """加载日志配置"""
-        return LoggingConfig(
-            level=get_env_value("LOG_LEVEL", "INFO", self.env_vars),
-            verbose=get_env_value("VERBOSE_LOGGING", False, self.env_vars),
-            file_path=get_env_value("LOG_FILE", env_vars=self.env_vars),
-            enable_color=get_env_value("ENABLE_COLOR_OUTPUT", True, self.env_vars)
-        )
-    
+        logging_config = LoggingConfig(**_resolve_schema(self._merged, _LOGGING_SCHEMA))
+
+        valid_levels = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+        if logging_config.level.upper() not in valid_levels:
+            self._errors.append(
+                f"LOG_LEVEL必须是以下之一: {', '.join(valid_levels)}"
+            )
+
+        return logging_config
+
     def _load_project_config(self) -> ProjectConfig:
         """加载项目配置"""
-        return ProjectConfig(
-            name=get_env_value("PROJECT_NAME", "AutoGen Programming Workflow", self.env_vars),
-            version=get_env_value("PROJECT_VERSION", "1.0.0", self.env_vars),
-            default_language=get_env_value("DEFAULT_LANGUAGE", "python", self.env_vars),
-            results_dir=get_env_value("RESULTS_DIR", "results", self.env_vars),
-            debug_mode=get_env_value("DEBUG_MODE", False, self.env_vars),
-            save_intermediate_results=get_env_value("SAVE_INTERMEDIATE_RESULTS", False, self.env_vars)
-        )
-    
-    def _load_cache_config(self) -> CacheConfig:
-        """加载缓存配置"""
-        return CacheConfig(
-            enable_cache=get_env_value("ENABLE_RESPONSE_CACHE", False, self.env_vars),
-            expiry_hours=get_env_value("CACHE_EXPIRY_HOURS", 24, self.env_vars)
-        )
-    
-    def _load_proxy_config(self) -> ProxyConfig:
-        """加载代理配置"""
-        return ProxyConfig(
-            http_proxy=get_env_value("HTTP_PROXY", env_vars=self.env_vars),
-            https_proxy=get_env_value("HTTPS_PROXY", env_vars=self.env_vars)
-        )
+        return ProjectConfig(**_resolve_schema(self._merged, _PROJECT_SCHEMA))
+
+    @cached_property
+    def workflow(self) -> WorkflowConfig:
+        """工作流配置（首次访问时构建）"""
+        workflow_config = WorkflowConfig(**_resolve_schema(self._merged, _WORKFLOW_SCHEMA))
+
+        if workflow_config.basic_max_messages <= 0:
+            self._errors.append("BASIC_WORKFLOW_MAX_MESSAGES必须大于0")
+        if workflow_config.advanced_max_messages <= 0:
+            self._errors.append("ADVANCED_WORKFLOW_MAX_MESSAGES必须大于0")
+
+        return workflow_config
+
+    @cached_property
+    def cache(self) -> CacheConfig:
+        """缓存配置（首次访问时构建）"""
+        return CacheConfig(**_resolve_schema(self._merged, _CACHE_SCHEMA))
+
+    @cached_property
+    def proxy(self) -> ProxyConfig:
+        """代理配置（首次访问时构建）"""
+        return ProxyConfig(**_resolve_schema(self._merged, _PROXY_SCHEMA))
     
     def _setup_logging(self):
         """设置日志"""
         level = getattr(logging, self.logging.level.upper(), logging.INFO)
         
-        # 配置日志格式
+        # 配置日志格式：彩色输出用_ColorFormatter按级别注入颜色码，
+        # 文件日志始终使用无ANSI码的纯文本格式
+        plain_formatter = logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        )
         if self.logging.enable_color:
-            format_str = "%(asctime)s - \033[1;36m%(name)s\033[0m - \033[1;%(levelcolor)sm%(levelname)s\033[0m - %(message)s"
+            console_formatter = _ColorFormatter(
+                "%(asctime)s - \033[1;36m%(name)s\033[0m - \033[1;%(levelcolor)sm%(levelname)s\033[0m - %(message)s"
+            )
         else:
-            format_str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        
+            console_formatter = plain_formatter
+
         # 配置处理器
-        handlers = [logging.StreamHandler()]
-        
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(console_formatter)
+        handlers = [console_handler]
+        self._log_listener = None
+
         if self.logging.file_path:
             # 确保日志目录存在
             log_dir = os.path.dirname(self.logging.file_path)
             if log_dir:
                 os.makedirs(log_dir, exist_ok=True)
-            handlers.append(logging.FileHandler(self.logging.file_path))
+
+            # 文件写入走队列：业务线程只入队（无磁盘等待），
+            # 由QueueListener的后台线程执行真正的文件写入
+            log_queue = queue.SimpleQueue()
+            file_handler = logging.FileHandler(self.logging.file_path)
+            file_handler.setFormatter(plain_formatter)
+            self._log_listener = logging.handlers.QueueListener(
+                log_queue, file_handler
+            )
+            self._log_listener.start()
+            # 进程退出时停止监听线程，确保队列中的记录落盘
+            atexit.register(self._log_listener.stop)
+            handlers.append(logging.handlers.QueueHandler(log_queue))
         
-        # 配置根日志器
+        # 配置根日志器（格式已逐处理器设置）
         logging.basicConfig(
             level=level,
-            format=format_str,
             handlers=handlers,
             force=True
         )
@@ -295,15 +496,17 @@ class EnvironmentConfig:
     
     def _create_directories(self):
         """创建必要的目录"""
-        directories = [self.project.results_dir]
-        
+        # set去重：日志目录可能与结果目录重合，避免重复的makedirs系统调用
+        directories = {self.project.results_dir}
+
         if self.logging.file_path:
             log_dir = os.path.dirname(self.logging.file_path)
             if log_dir:
-                directories.append(log_dir)
-        
+                directories.add(log_dir)
+
         for directory in directories:
-            os.makedirs(directory, exist_ok=True)
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
     
     def validate_config(self) -> List[str]:
         """
@@ -312,31 +515,10 @@ class EnvironmentConfig:
         Returns:
             错误信息列表
         """
-        errors = []
-        
-        # 验证API配置
-        if not self.api.api_key:
-            if self.api.provider == "gemini":
-                errors.append("GEMINI_API_KEY未设置")
-            else:
-                errors.append("OPENAI_API_KEY未设置")
-
-        if self.api.temperature < 0 or self.api.temperature > 2:
-            errors.append("MODEL_TEMPERATURE必须在0-2之间")
-        
-        # 验证工作流配置
-        if self.workflow.basic_max_messages <= 0:
-            errors.append("BASIC_WORKFLOW_MAX_MESSAGES必须大于0")
-        
-        if self.workflow.advanced_max_messages <= 0:
-            errors.append("ADVANCED_WORKFLOW_MAX_MESSAGES必须大于0")
-        
-        # 验证日志级别
-        valid_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
-        if self.logging.level.upper() not in valid_levels:
-            errors.append(f"LOG_LEVEL必须是以下之一: {', '.join(valid_levels)}")
-        
-        return errors
+        # 校验在各加载器构建时已就地完成；这里只需触发
+        # 惰性配置组的构建，再返回收集到的错误
+        _ = self.workflow
+        return list(self._errors)
     
     def print_config_summary(self):
         """打印配置摘要"""
@@ -353,36 +535,48 @@ class EnvironmentConfig:
         print("=" * 50)
 
 
-# 全局配置实例
-config = None
+# 配置实例缓存，按 (绝对路径, 文件mtime) 键控
+# 同一个未修改的.env文件只构建一次配置；文件更新后键变化自动失效
+_CONFIG_CACHE: Dict[tuple, EnvironmentConfig] = {}
+
+
+def _config_cache_key(env_file: str) -> tuple:
+    """计算配置缓存键（文件不存在时mtime记为None）"""
+    abspath = os.path.abspath(env_file)
+    try:
+        mtime_ns = os.stat(abspath).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    return (abspath, mtime_ns)
 
 
 def get_config(env_file: str = ".env") -> EnvironmentConfig:
     """
     获取全局配置实例
-    
+
     Args:
         env_file: .env文件路径
-        
+
     Returns:
         配置实例
     """
-    global config
-    if config is None:
-        config = EnvironmentConfig(env_file)
-    return config
+    key = _config_cache_key(env_file)
+    cached = _CONFIG_CACHE.get(key)
+    if cached is None:
+        cached = EnvironmentConfig(env_file)
+        _CONFIG_CACHE[key] = cached
+    return cached
 
 
 def reload_config(env_file: str = ".env") -> EnvironmentConfig:
     """
     重新加载配置
-    
+
     Args:
         env_file: .env文件路径
-        
+
     Returns:
         新的配置实例
     """
-    global config
-    config = EnvironmentConfig(env_file)
-    return config
+    _CONFIG_CACHE.clear()
+    return get_config(env_file)
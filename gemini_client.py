@@ -4,7 +4,9 @@ Gemini API客户端适配器
 """
 
 import asyncio
+import functools
 import logging
+from collections import OrderedDict
 from typing import List, Optional, Dict, Any, Union
 import json
 
@@ -15,6 +17,12 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
 from autogen_core.models import ChatCompletionClient
 from autogen_core.models._types import (
     ChatCompletionTokenLogprob,
@@ -28,6 +36,18 @@ from autogen_core.models._types import (
 )
 
 
+# GenerativeModel缓存：相同(api_key, 模型, 温度, max_tokens)的客户端
+# 共享同一个模型实例，避免多Agent工作流重复构建
+_MODEL_CACHE: Dict[tuple, Any] = {}
+
+# 已经configure过的api_key集合，genai.configure是全局操作，每个密钥只做一次
+_CONFIGURED_KEYS = set()
+
+# 已完成连接预热的模型缓存键集合，预热本身是一次真实调用，
+# 同一配置的模型实例只做一次
+_WARMED_KEYS = set()
+
+
 class GeminiChatCompletionClient(ChatCompletionClient):
     """Gemini API客户端，兼容AutoGen的ChatCompletionClient接口"""
     
@@ -61,48 +81,123 @@ class GeminiChatCompletionClient(ChatCompletionClient):
         self.max_tokens = max_tokens
         self.timeout = timeout
         
-        # 配置Gemini API
-        genai.configure(api_key=api_key)
-        
-        # 创建模型实例
-        generation_config = genai.types.GenerationConfig(
-            temperature=temperature,
-            max_output_tokens=max_tokens,
-        )
-        
-        # 安全设置 - 允许所有内容以避免过度审查
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-        
-        self.model = genai.GenerativeModel(
-            model_name=model,
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
-        
+        # 配置Gemini API（全局操作，每个api_key只执行一次）
+        if api_key not in _CONFIGURED_KEYS:
+            genai.configure(api_key=api_key)
+            _CONFIGURED_KEYS.add(api_key)
+
+        # 复用相同配置的模型实例，未命中时才构建
+        cache_key = (api_key, model, temperature, max_tokens)
+        cached_model = _MODEL_CACHE.get(cache_key)
+        if cached_model is None:
+            # 创建模型实例
+            generation_config = genai.types.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_tokens,
+            )
+
+            # 安全设置 - 允许所有内容以避免过度审查
+            safety_settings = {
+                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+            }
+
+            cached_model = genai.GenerativeModel(
+                model_name=model,
+                generation_config=generation_config,
+                safety_settings=safety_settings
+            )
+            _MODEL_CACHE[cache_key] = cached_model
+
+        self.model = cached_model
+
         self.logger = logging.getLogger(__name__)
-    
+
+        # 批量调用的并发上限，避免一次fan-out把过多请求压向Gemini
+        self._batch_semaphore = asyncio.Semaphore(8)
+
+        # 消息列表 -> (提示文本, 估算令牌数) 的记忆化缓存
+        # 以消息对象id元组为键，create和count_tokens对同一段历史
+        # 只做一次格式转换；OrderedDict按LRU淘汰，容量有界。
+        # 条目中同时保存消息元组以钉住对象：id只在对象存活期间
+        # 唯一，若不持有引用，释放后的id被新消息复用会造成
+        # 把上一段历史发给模型的脏命中
+        self._fmt_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._fmt_cache_size = 32
+
+        # 后台预热连接：发起一次极小的请求，让TLS/HTTP2握手在
+        # 用户输入等空闲时间内完成，首个真实请求省掉一次往返。
+        # 构造时若不在事件循环内（同步上下文、工作线程）则跳过
+        self._warmup_task = None
+        if cache_key not in _WARMED_KEYS:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                _WARMED_KEYS.add(cache_key)
+                self._warmup_task = loop.create_task(self._warmup())
+
+    async def _warmup(self):
+        """发送一次极小请求以预建连接（失败只记日志，不影响正式调用）"""
+        try:
+            await asyncio.wait_for(
+                self.model.generate_content_async("ping"), timeout=5
+            )
+            self.logger.debug("Gemini连接预热完成")
+        except Exception as e:
+            self.logger.debug(f"Gemini连接预热失败（忽略）: {e}")
+
+    async def _await_warmup(self):
+        """在首个正式请求前等待预热结束，复用其建立的连接状态"""
+        task, self._warmup_task = self._warmup_task, None
+        if task is not None:
+            await task
+
+    # 消息类型 -> 角色前缀的分发表，替代逐个isinstance判断
+    # Gemini没有专门的系统消息，System同样以文本前缀表达
+    _ROLE_PREFIX = {
+        SystemMessage: "System: ",
+        UserMessage: "User: ",
+        AssistantMessage: "Assistant: ",
+    }
+
+    def _format_messages(self, messages: List[LLMMessage]) -> tuple:
+        """转换消息并返回(提示文本, 估算令牌数)，带记忆化缓存"""
+        key = tuple(id(message) for message in messages)
+        entry = self._fmt_cache.get(key)
+        if entry is not None:
+            cached_messages, result = entry
+            # 逐个比对身份：条目持有的引用保证其id在存活期间
+            # 不被复用，身份全部一致才是同一段历史
+            if len(cached_messages) == len(messages) and all(
+                a is b for a, b in zip(cached_messages, messages)
+            ):
+                self._fmt_cache.move_to_end(key)
+                return result
+
+        prompt = self._convert_messages_to_gemini_format(messages)
+        # 粗略估算：1个令牌约等于4个字符
+        result = (prompt, len(prompt) // 4)
+
+        self._fmt_cache[key] = (tuple(messages), result)
+        if len(self._fmt_cache) > self._fmt_cache_size:
+            self._fmt_cache.popitem(last=False)
+        return result
+
     def _convert_messages_to_gemini_format(self, messages: List[LLMMessage]) -> str:
         """将AutoGen消息格式转换为Gemini格式"""
-        conversation = []
-        
-        for message in messages:
-            if isinstance(message, SystemMessage):
-                # Gemini没有专门的系统消息，将其作为用户消息的前缀
-                conversation.append(f"System: {message.content}")
-            elif isinstance(message, UserMessage):
-                conversation.append(f"User: {message.content}")
-            elif isinstance(message, AssistantMessage):
-                conversation.append(f"Assistant: {message.content}")
-            else:
-                # 其他类型的消息也作为用户消息处理
-                conversation.append(f"User: {str(message.content)}")
-        
-        return "\n\n".join(conversation)
+        prefixes = self._ROLE_PREFIX
+        # 列表推导一次性生成各行，join只做一趟O(总长度)拼接；
+        # 未知消息类型也作为用户消息处理
+        parts = [
+            prefixes.get(type(message), "User: ")
+            + (message.content if isinstance(message.content, str) else str(message.content))
+            for message in messages
+        ]
+        return "\n\n".join(parts)
     
     async def create(
         self,
@@ -123,17 +218,17 @@ class GeminiChatCompletionClient(ChatCompletionClient):
             创建结果
         """
         try:
-            # 转换消息格式
-            prompt = self._convert_messages_to_gemini_format(messages)
-            
+            # 等待后台预热完成（若有），复用已建立的连接
+            await self._await_warmup()
+
+            # 转换消息格式（带缓存，同一段历史只转换一次）
+            prompt, _ = self._format_messages(messages)
+
             self.logger.debug(f"发送到Gemini的提示: {prompt[:200]}...")
-            
-            # 调用Gemini API
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                prompt
-            )
-            
+
+            # 调用Gemini API（原生异步接口，不占用线程池工作线程）
+            response = await self.model.generate_content_async(prompt)
+
             # 检查响应
             if not response.text:
                 raise ValueError("Gemini API返回空响应")
@@ -156,7 +251,83 @@ class GeminiChatCompletionClient(ChatCompletionClient):
         except Exception as e:
             self.logger.error(f"Gemini API调用失败: {e}")
             raise RuntimeError(f"Gemini API调用失败: {e}")
-    
+
+    async def create_stream(
+        self,
+        messages: List[LLMMessage],
+        *,
+        cancellation_token: Optional[Any] = None,
+        **kwargs
+    ):
+        """
+        流式创建聊天完成，逐块产出文本
+
+        Args:
+            messages: 消息列表
+            cancellation_token: 取消令牌
+            **kwargs: 其他参数
+
+        Yields:
+            文本片段，最后产出完整的CreateResult
+        """
+        await self._await_warmup()
+
+        prompt, _ = self._format_messages(messages)
+
+        self.logger.debug(f"发送到Gemini的流式提示: {prompt[:200]}...")
+
+        try:
+            chunks = []
+            # 流式调用，网络传输与下游处理重叠
+            async for chunk in await self.model.generate_content_async(
+                prompt, stream=True
+            ):
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+
+            full_text = "".join(chunks)
+            if not full_text:
+                raise ValueError("Gemini API返回空响应")
+
+            yield CreateResult(
+                content=full_text,
+                finish_reason="stop",
+                usage=RequestUsage(
+                    prompt_tokens=0,
+                    completion_tokens=0,
+                    total_tokens=0
+                ),
+                cached=False,
+                logprobs=None
+            )
+
+        except Exception as e:
+            self.logger.error(f"Gemini API流式调用失败: {e}")
+            raise RuntimeError(f"Gemini API流式调用失败: {e}")
+
+    async def create_batch(
+        self,
+        message_batches: List[List[LLMMessage]],
+        **kwargs
+    ) -> List[CreateResult]:
+        """
+        批量创建聊天完成，多个请求在信号量限制下并发发出
+
+        Args:
+            message_batches: 多组消息列表
+
+        Returns:
+            与输入顺序对应的结果列表
+        """
+        async def _one(messages: List[LLMMessage]) -> CreateResult:
+            async with self._batch_semaphore:
+                return await self.create(messages, **kwargs)
+
+        return await asyncio.gather(
+            *(_one(messages) for messages in message_batches)
+        )
+
     @property
     def capabilities(self) -> Dict[str, Any]:
         """返回客户端能力"""
@@ -164,7 +335,7 @@ class GeminiChatCompletionClient(ChatCompletionClient):
             "vision": "gemini-pro-vision" in self.model_name,
             "function_calling": False,  # Gemini的函数调用支持有限
             "json_output": False,
-            "streaming": False
+            "streaming": True
         }
     
     def count_tokens(self, messages: List[LLMMessage]) -> int:
@@ -177,17 +348,69 @@ class GeminiChatCompletionClient(ChatCompletionClient):
         Returns:
             令牌数
         """
-        # 简单的令牌计数估算
-        text = self._convert_messages_to_gemini_format(messages)
-        # 粗略估算：1个令牌约等于4个字符
-        return len(text) // 4
+        # 简单的令牌计数估算，命中缓存时为O(1)
+        _, token_count = self._format_messages(messages)
+        return token_count
     
     async def close(self):
         """关闭客户端连接"""
+        # 取消尚未完成的预热任务
+        task, self._warmup_task = self._warmup_task, None
+        if task is not None:
+            task.cancel()
         # Gemini客户端不需要显式关闭
         self.logger.info("Gemini客户端已关闭")
 
 
+# 进程内共享的httpx客户端，所有OpenAI模型客户端复用同一个连接池
+_shared_http_client = None
+
+
+def _get_shared_http_client(timeout: int):
+    """获取共享的httpx异步客户端（惰性创建）
+
+    调高连接池上限并尽量启用HTTP/2，让并行的Agent请求
+    复用已建立的连接而不是反复进行TCP/TLS握手
+
+    Args:
+        timeout: 请求超时时间（秒）
+
+    Returns:
+        共享的httpx.AsyncClient实例
+    """
+    global _shared_http_client
+    # openai SDK/autogen会在自身close()时关闭传入的http_client，
+    # 共享池可能被某个工作流关掉；已关闭时重建而不是继续
+    # 把绑定死连接池的客户端发给后续调用方
+    if _shared_http_client is None or _shared_http_client.is_closed:
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        try:
+            _shared_http_client = httpx.AsyncClient(limits=limits, http2=True, timeout=timeout)
+        except ImportError:
+            # 未安装h2扩展时退回HTTP/1.1
+            _shared_http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+    return _shared_http_client
+
+
+async def close_shared_http_client():
+    """关闭进程内共享的httpx连接池
+
+    进程退出或重载配置后调用，释放保持中的连接；
+    之后再创建客户端会惰性重建连接池
+    """
+    global _shared_http_client
+    if _shared_http_client is not None:
+        await _shared_http_client.aclose()
+        _shared_http_client = None
+
+
+@functools.cache
+def _openai_client_cls():
+    """惰性导入OpenAI客户端类（只解析一次，后续调用直接返回）"""
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+    return OpenAIChatCompletionClient
+
+
 def create_model_client(api_config):
     """
     根据API配置创建模型客户端
@@ -207,14 +430,20 @@ def create_model_client(api_config):
             timeout=api_config.timeout
         )
     else:
-        # 使用OpenAI客户端
-        from autogen_ext.models.openai import OpenAIChatCompletionClient
-        return OpenAIChatCompletionClient(
-            model=api_config.model,
-            api_key=api_config.api_key,
-            base_url=api_config.base_url,
-            timeout=api_config.timeout
-        )
+        # 使用OpenAI客户端（类对象经functools.cache缓存）
+        client_cls = _openai_client_cls()
+
+        client_kwargs = {
+            "model": api_config.model,
+            "api_key": api_config.api_key,
+            "base_url": api_config.base_url,
+            "timeout": api_config.timeout,
+        }
+        # 注入共享连接池（httpx可用时）
+        if HTTPX_AVAILABLE:
+            client_kwargs["http_client"] = _get_shared_http_client(api_config.timeout)
+
+        return client_cls(**client_kwargs)
 
 
 # 兼容性函数
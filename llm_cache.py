@@ -0,0 +1,276 @@
+"""
+LLM响应缓存模块
+为模型客户端提供基于SHA-256键的响应缓存
+重复或相同的任务描述可以直接命中缓存，减少令牌消耗和网络延迟
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from autogen_core.models import CreateResult, RequestUsage
+
+
+class CacheBackend:
+    """缓存后端基类，定义get/set/delete接口"""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取缓存条目，未命中时返回None"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """写入缓存条目"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """删除缓存条目"""
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """基于内存的LRU缓存后端"""
+
+    def __init__(self, max_size: int = 128):
+        """
+        初始化内存缓存
+
+        Args:
+            max_size: 最大缓存条目数，超出时淘汰最久未使用的条目
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            # 命中后移到末尾，保持LRU顺序
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """基于SQLite的持久化缓存后端
+
+    条目落盘在本地数据库文件中，跨进程、跨运行保留；
+    适合测试脚本等反复发送相同提示的场景，重复运行直接命中
+    而不再产生网络往返和令牌消耗
+    """
+
+    def __init__(self, path: str = ".llm_cache.sqlite"):
+        """
+        初始化SQLite缓存
+
+        Args:
+            path: 数据库文件路径
+        """
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, response TEXT, ts REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT response FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (key, response, ts) VALUES (?, ?, ?)",
+            (
+                key,
+                json.dumps(value, ensure_ascii=False),
+                value.get("timestamp", time.time()),
+            ),
+        )
+        self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        self._conn.commit()
+
+
+class RedisCacheBackend(CacheBackend):
+    """基于Redis的缓存后端（需要安装redis包）"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "llm_cache:"):
+        """
+        初始化Redis缓存
+
+        Args:
+            url: Redis连接URL
+            prefix: 缓存键前缀
+        """
+        if not REDIS_AVAILABLE:
+            raise ImportError("redis包未安装。请运行: pip install redis")
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        data = self._client.get(self.prefix + key)
+        if data is None:
+            return None
+        return json.loads(data)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._client.set(self.prefix + key, json.dumps(value, ensure_ascii=False))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self.prefix + key)
+
+
+def _message_to_dict(message: Any) -> Dict[str, Any]:
+    """将LLMMessage转换为可序列化的字典"""
+    model_dump = getattr(message, "model_dump", None)
+    if model_dump is not None:
+        try:
+            return model_dump(mode="json")
+        except TypeError:
+            return model_dump()
+    return {
+        "type": type(message).__name__,
+        "content": str(getattr(message, "content", message)),
+        "source": getattr(message, "source", None),
+    }
+
+
+class CachedChatCompletionClient:
+    """带响应缓存的模型客户端包装器
+
+    包装任意ChatCompletionClient，对create调用计算SHA-256缓存键
+    （覆盖模型、温度、消息内容和工具名），命中时直接返回缓存结果。
+    所有Agent共享同一个model_client，因此一个缓存可以惠及全部节点。
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        model: str,
+        temperature: float = 0.1,
+        expiry_hours: int = 24,
+        backend: Optional[CacheBackend] = None,
+    ):
+        """
+        初始化缓存客户端
+
+        Args:
+            client: 被包装的模型客户端
+            model: 模型名称（参与缓存键计算）
+            temperature: 温度参数（参与缓存键计算）
+            expiry_hours: 缓存过期时间（小时），0表示永不过期
+            backend: 缓存后端，默认为内存LRU
+        """
+        self._client = client
+        self.model = model
+        self.temperature = temperature
+        self.expiry_seconds = expiry_hours * 3600
+        self.backend = backend or MemoryCacheBackend()
+        self.logger = logging.getLogger(__name__)
+
+    def _cache_key(self, messages: List[Any], tools: Optional[List[Any]] = None) -> str:
+        """计算请求的SHA-256缓存键"""
+        payload = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [_message_to_dict(m) for m in messages],
+            "tools": sorted(getattr(t, "name", str(t)) for t in tools or []),
+        }
+        # 键序列化优先走orjson（C实现，OPT_SORT_KEYS保证规范顺序），
+        # 未安装时退回标准库json
+        if ORJSON_AVAILABLE:
+            serialized = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        else:
+            serialized = json.dumps(
+                payload, sort_keys=True, ensure_ascii=False
+            ).encode("utf-8")
+        return hashlib.sha256(serialized).hexdigest()
+
+    def _result_to_entry(self, result: CreateResult) -> Dict[str, Any]:
+        """将CreateResult转换为缓存条目"""
+        return {
+            "timestamp": time.time(),
+            "content": result.content,
+            "finish_reason": result.finish_reason,
+        }
+
+    def _entry_to_result(self, entry: Dict[str, Any]) -> CreateResult:
+        """从缓存条目重建CreateResult"""
+        return CreateResult(
+            content=entry["content"],
+            finish_reason=entry["finish_reason"],
+            usage=RequestUsage(prompt_tokens=0, completion_tokens=0),
+            cached=True,
+            logprobs=None,
+        )
+
+    def _is_expired(self, entry: Dict[str, Any]) -> bool:
+        """检查缓存条目是否过期"""
+        if self.expiry_seconds <= 0:
+            return False
+        return time.time() - entry["timestamp"] > self.expiry_seconds
+
+    async def create(self, messages: List[Any], **kwargs) -> CreateResult:
+        """创建聊天完成，优先从缓存返回"""
+        key = self._cache_key(messages, kwargs.get("tools"))
+
+        entry = self.backend.get(key)
+        if entry is not None:
+            if self._is_expired(entry):
+                self.backend.delete(key)
+            else:
+                self.logger.debug(f"缓存命中: {key[:16]}...")
+                return self._entry_to_result(entry)
+
+        result = await self._client.create(messages, **kwargs)
+
+        # 只缓存纯文本结果，跳过函数调用等结构化内容
+        if isinstance(result.content, str):
+            self.backend.set(key, self._result_to_entry(result))
+
+        return result
+
+    def create_stream(self, messages: List[Any], **kwargs):
+        """流式调用不做缓存，直接透传给底层客户端"""
+        return self._client.create_stream(messages, **kwargs)
+
+    def count_tokens(self, messages: List[Any], **kwargs) -> int:
+        """委托底层客户端计算令牌数"""
+        return self._client.count_tokens(messages, **kwargs)
+
+    async def close(self):
+        """关闭底层客户端连接"""
+        await self._client.close()
+
+    def __getattr__(self, name: str) -> Any:
+        """其余属性和方法委托给底层客户端"""
+        return getattr(self._client, name)
@@ -0,0 +1,107 @@
+"""
+索引式消息过滤模块
+用单遍扫描加按来源索引替代逐来源的全历史扫描
+"""
+
+from collections import deque
+from typing import Dict, List, Tuple
+
+from autogen_agentchat.agents import MessageFilterAgent, MessageFilterConfig
+
+
+class IndexedMessageFilter:
+    """单遍索引式消息过滤器
+
+    原生的按来源过滤对每个PerSourceFilter各扫描一次完整消息历史，
+    复杂度为O(N×来源数)。这里一次遍历用有界窗口收集每个来源的
+    首/尾若干条：首部是封顶的列表，尾部是deque(maxlen)滚动窗口，
+    每条消息O(1)处理且内存有界，与历史长度无关
+    """
+
+    def __init__(self, filter_config: MessageFilterConfig):
+        """
+        初始化过滤器
+
+        Args:
+            filter_config: 按来源的过滤配置
+        """
+        self.per_source = list(filter_config.per_source)
+
+        # 预先按来源归并过滤需求：来源 -> (首部条数, 尾部条数, 全保留)
+        self._wants: Dict[str, Tuple[int, int, bool]] = {}
+        for source_filter in self.per_source:
+            first_count, last_count, keep_all = self._wants.get(
+                source_filter.source, (0, 0, False)
+            )
+            if source_filter.position is None or source_filter.count is None:
+                # 与MessageFilterAgent一致：position或count未设置时
+                # 保留该来源的全部消息
+                keep_all = True
+            elif source_filter.position == "first":
+                first_count = max(first_count, source_filter.count)
+            else:
+                last_count = max(last_count, source_filter.count)
+            self._wants[source_filter.source] = (first_count, last_count, keep_all)
+
+    def apply(self, messages: List) -> List:
+        """应用过滤规则
+
+        Args:
+            messages: 完整消息列表
+
+        Returns:
+            过滤后的消息列表（保持原始顺序）
+        """
+        # 每个来源维护封顶的首部列表和deque滚动的尾部窗口；
+        # 全保留的来源首部不封顶、不建尾部窗口
+        firsts: Dict[str, List[int]] = {}
+        lasts: Dict[str, deque] = {}
+        for source, (first_count, last_count, keep_all) in self._wants.items():
+            firsts[source] = []
+            if last_count and not keep_all:
+                lasts[source] = deque(maxlen=last_count)
+
+        # 单遍扫描，O(1)处理每条消息
+        for index, message in enumerate(messages):
+            source = getattr(message, 'source', None)
+            want = self._wants.get(source)
+            if want is None:
+                continue
+
+            first_count, _, keep_all = want
+            bucket = firsts[source]
+            if keep_all or len(bucket) < first_count:
+                bucket.append(index)
+
+            window = lasts.get(source)
+            if window is not None:
+                window.append(index)
+
+        picked = set()
+        for source in self._wants:
+            picked.update(firsts[source])
+            picked.update(lasts.get(source, ()))
+
+        # 按原始顺序返回
+        return [messages[i] for i in sorted(picked)]
+
+
+class IndexedMessageFilterAgent(MessageFilterAgent):
+    """使用索引式过滤的MessageFilterAgent
+
+    过滤语义与MessageFilterAgent一致，但消息选择通过
+    IndexedMessageFilter的单遍索引完成，再把结果交给被包装的Agent
+    """
+
+    def __init__(self, name: str, wrapped_agent, filter: MessageFilterConfig):
+        super().__init__(name=name, wrapped_agent=wrapped_agent, filter=filter)
+        self._indexed_filter = IndexedMessageFilter(filter)
+        self._inner_agent = wrapped_agent
+
+    async def on_messages(self, messages, cancellation_token):
+        filtered = self._indexed_filter.apply(list(messages))
+        return await self._inner_agent.on_messages(filtered, cancellation_token)
+
+    def on_messages_stream(self, messages, cancellation_token):
+        filtered = self._indexed_filter.apply(list(messages))
+        return self._inner_agent.on_messages_stream(filtered, cancellation_token)
@@ -6,14 +6,117 @@ AutoGen编程工作流启动脚本
 
 import asyncio
 import argparse
+import atexit
 import os
 import sys
 from typing import List
 
-from autogen_programming_workflow import ProgrammingWorkflow, ProgrammingTask
-from autogen_advanced_programming_workflow import AdvancedProgrammingWorkflow, AdvancedProgrammingTask
 from env_config import get_config
 
+# 工作流模块在各自的使用点内惰性导入：
+# --help和basic模式不再为未用到的模块图（autogen、模型SDK）付出导入开销
+
+
+# 复杂度选项映射（模块级常量，避免每次调用重建）
+COMPLEXITY_MAP = {"1": "low", "2": "medium", "3": "high"}
+
+
+def _make_todo_task():
+    """构建基础演示任务：待办事项管理器"""
+    from autogen_programming_workflow import ProgrammingTask
+
+    return ProgrammingTask(
+        description="创建一个简单的待办事项管理器",
+        requirements=[
+            "支持添加、删除、标记完成任务",
+            "任务可以设置优先级",
+            "支持任务搜索功能",
+            "数据持久化存储",
+            "提供简单的命令行界面"
+        ],
+        language="python"
+    )
+
+
+def _make_blog_task():
+    """构建高级演示任务：博客API系统"""
+    from autogen_advanced_programming_workflow import AdvancedProgrammingTask
+
+    return AdvancedProgrammingTask(
+        description="开发一个简单的博客API系统",
+        requirements=[
+            "用户注册和登录功能",
+            "文章的CRUD操作",
+            "评论系统",
+            "文章分类和标签",
+            "RESTful API设计"
+        ],
+        language="python",
+        complexity_level="medium",
+        security_requirements=[
+            "用户密码安全存储",
+            "API访问权限控制",
+            "防止XSS和SQL注入"
+        ],
+        performance_requirements=[
+            "支持100+并发用户",
+            "API响应时间<500ms",
+            "数据库查询优化"
+        ]
+    )
+
+
+# 演示任务工厂：只在用户选中时才构建对应的任务对象
+DEMO_FACTORIES = {
+    "1": ("basic", _make_todo_task),
+    "2": ("advanced", _make_blog_task),
+}
+
+
+# 按类型缓存的演示工作流实例（见_get_demo_workflow）
+_demo_workflows = {}
+
+
+def _get_demo_workflow(kind: str, config):
+    """按类型缓存的演示工作流单例
+
+    同一进程内反复运行演示（开发调试、REPL中多次调用）时
+    复用已构建的Agent图和模型客户端，不再每次从头重建；
+    连接在进程退出时通过atexit统一关闭
+    """
+    workflow = _demo_workflows.get(kind)
+    if workflow is not None:
+        return workflow
+
+    if kind == "basic":
+        from autogen_programming_workflow import ProgrammingWorkflow
+
+        workflow = ProgrammingWorkflow(config)
+    else:
+        from autogen_advanced_programming_workflow import AdvancedProgrammingWorkflow
+
+        workflow = AdvancedProgrammingWorkflow(config)
+
+    def _close_at_exit(workflow=workflow):
+        try:
+            asyncio.run(workflow.close())
+        except Exception:
+            # 失败的运行可能已经关闭过模型客户端，重复关闭不致命
+            pass
+
+    _demo_workflows[kind] = workflow
+    atexit.register(_close_at_exit)
+    return workflow
+
+
+def _evict_demo_workflow(kind: str):
+    """把某类演示工作流逐出缓存
+
+    运行失败时调用：流式消费的异常路径会关闭模型客户端，
+    缓存实例若继续复用会一直拿着已关闭的连接
+    """
+    _demo_workflows.pop(kind, None)
+
 
 def check_config():
     """检查配置是否正确"""
@@ -34,59 +137,87 @@ def check_config():
         sys.exit(1)
 
 
+# 管道输入时一次性读入的行缓冲（交互模式不使用）
+_stdin_lines = None
+
+
+def _next_line(prompt: str) -> str:
+    """读取一行输入
+
+    交互模式直接走input()；stdin为管道/文件时（CI或演示脚本
+    重定向输入），首次调用把剩余输入一次读完并按行缓冲，
+    后续调用只做内存取行而不再逐次阻塞在读系统调用上
+    """
+    global _stdin_lines
+    if sys.stdin.isatty():
+        return input(prompt)
+
+    if _stdin_lines is None:
+        _stdin_lines = iter(sys.stdin.read().splitlines())
+
+    try:
+        line = next(_stdin_lines)
+    except StopIteration:
+        # 与input()的约定一致：输入耗尽时抛EOFError，
+        # 而不是返回空串让必填项校验陷入死循环
+        raise EOFError("输入已结束") from None
+    # 回显提示和输入，保持与交互模式一致的输出
+    print(f"{prompt}{line}")
+    return line
+
+
 def get_user_input(prompt: str, required: bool = True) -> str:
     """获取用户输入"""
     while True:
-        value = input(prompt).strip()
+        value = _next_line(prompt).strip()
         if value or not required:
             return value
         print("此字段为必填项，请重新输入。")
 
 
-def get_requirements() -> List[str]:
-    """获取需求列表"""
+def _collect_requirements(header: str, label: str, optional: bool = False) -> List[str]:
+    """循环收集一类需求（每行一条，空行结束）
+
+    Args:
+        header: 提示标题中的需求名称
+        label: 每行提示的前缀
+        optional: 是否在提示中标注可选
+
+    Returns:
+        需求列表
+    """
     requirements = []
-    print("\n请输入项目需求（每行一个，输入空行结束）:")
-    
+    suffix = "，可选" if optional else ""
+    print(f"\n请输入{header}（每行一个，输入空行结束{suffix}）:")
+
     while True:
-        req = input(f"需求 {len(requirements) + 1}: ").strip()
+        req = _next_line(f"{label} {len(requirements) + 1}: ").strip()
         if not req:
             break
         requirements.append(req)
-    
+
     return requirements
 
 
+def get_requirements() -> List[str]:
+    """获取需求列表"""
+    return _collect_requirements("项目需求", "需求")
+
+
 def get_security_requirements() -> List[str]:
     """获取安全需求列表"""
-    requirements = []
-    print("\n请输入安全需求（每行一个，输入空行结束，可选）:")
-    
-    while True:
-        req = input(f"安全需求 {len(requirements) + 1}: ").strip()
-        if not req:
-            break
-        requirements.append(req)
-    
-    return requirements
+    return _collect_requirements("安全需求", "安全需求", optional=True)
 
 
 def get_performance_requirements() -> List[str]:
     """获取性能需求列表"""
-    requirements = []
-    print("\n请输入性能需求（每行一个，输入空行结束，可选）:")
-    
-    while True:
-        req = input(f"性能需求 {len(requirements) + 1}: ").strip()
-        if not req:
-            break
-        requirements.append(req)
-    
-    return requirements
+    return _collect_requirements("性能需求", "性能需求", optional=True)
 
 
 async def run_basic_workflow(config):
     """运行基础工作流"""
+    from autogen_programming_workflow import ProgrammingWorkflow, ProgrammingTask
+
     print("🔥 基础编程工作流")
     print("=" * 50)
 
@@ -114,35 +245,66 @@ async def run_basic_workflow(config):
         await workflow.close()
 
 
-async def run_advanced_workflow(config):
-    """运行高级工作流"""
-    print("🚀 高级编程工作流")
-    print("=" * 50)
-
-    # 获取基本信息
+def _collect_advanced_inputs(config):
+    """收集高级工作流的全部用户输入（在工作线程中执行）"""
     description = get_user_input("请输入项目描述: ")
     language = get_user_input(f"请输入编程语言 (默认: {config.project.default_language}): ", required=False) or config.project.default_language
-    
+
     # 获取复杂度级别
     print("\n复杂度级别:")
     print("1. low - 简单项目")
     print("2. medium - 中等复杂度项目")
     print("3. high - 高复杂度项目")
-    
+
     complexity_choice = get_user_input("请选择复杂度级别 (1-3, 默认: 2): ", required=False) or "2"
-    complexity_map = {"1": "low", "2": "medium", "3": "high"}
-    complexity_level = complexity_map.get(complexity_choice, "medium")
-    
-    # 获取需求
+    complexity_level = COMPLEXITY_MAP.get(complexity_choice, "medium")
+
     requirements = get_requirements()
+    security_requirements = get_security_requirements()
+    performance_requirements = get_performance_requirements()
+
+    return (
+        description, language, complexity_level,
+        requirements, security_requirements, performance_requirements
+    )
+
+
+def _warm_advanced_workflow(config):
+    """构建高级工作流并触发惰性的Agent与图构建"""
+    from autogen_advanced_programming_workflow import AdvancedProgrammingWorkflow
+
+    workflow = AdvancedProgrammingWorkflow(config)
+    _ = workflow.graph_flow
+    return workflow
+
+
+async def run_advanced_workflow(config):
+    """运行高级工作流"""
+    from autogen_advanced_programming_workflow import AdvancedProgrammingTask
+
+    print("🚀 高级编程工作流")
+    print("=" * 50)
+
+    # 用户输入在工作线程中收集，同时在另一个线程预热工作流
+    # （Agent与图构建），把构建延迟隐藏在人工输入时间里
+    warmup = asyncio.create_task(asyncio.to_thread(_warm_advanced_workflow, config))
+
+    try:
+        (
+            description, language, complexity_level,
+            requirements, security_requirements, performance_requirements
+        ) = await asyncio.to_thread(_collect_advanced_inputs, config)
+    except BaseException:
+        warmup.cancel()
+        raise
+
+    workflow = await warmup
+
     if not requirements:
         print("❌ 至少需要一个项目需求")
+        await workflow.close()
         return
-    
-    # 获取安全和性能需求
-    security_requirements = get_security_requirements()
-    performance_requirements = get_performance_requirements()
-    
+
     # 创建高级任务
     task = AdvancedProgrammingTask(
         description=description,
@@ -152,9 +314,8 @@ async def run_advanced_workflow(config):
         security_requirements=security_requirements if security_requirements else None,
         performance_requirements=performance_requirements if performance_requirements else None
     )
-    
+
     # 运行高级工作流
-    workflow = AdvancedProgrammingWorkflow(config)
     try:
         await workflow.run_advanced_task(task)
     finally:
@@ -166,73 +327,32 @@ async def run_quick_demo(config):
     print("⚡ 快速演示模式")
     print("=" * 50)
     
-    # 预定义的演示任务
-    demo_tasks = {
-        "1": {
-            "type": "basic",
-            "task": ProgrammingTask(
-                description="创建一个简单的待办事项管理器",
-                requirements=[
-                    "支持添加、删除、标记完成任务",
-                    "任务可以设置优先级",
-                    "支持任务搜索功能",
-                    "数据持久化存储",
-                    "提供简单的命令行界面"
-                ],
-                language="python"
-            )
-        },
-        "2": {
-            "type": "advanced",
-            "task": AdvancedProgrammingTask(
-                description="开发一个简单的博客API系统",
-                requirements=[
-                    "用户注册和登录功能",
-                    "文章的CRUD操作",
-                    "评论系统",
-                    "文章分类和标签",
-                    "RESTful API设计"
-                ],
-                language="python",
-                complexity_level="medium",
-                security_requirements=[
-                    "用户密码安全存储",
-                    "API访问权限控制",
-                    "防止XSS和SQL注入"
-                ],
-                performance_requirements=[
-                    "支持100+并发用户",
-                    "API响应时间<500ms",
-                    "数据库查询优化"
-                ]
-            )
-        }
-    }
-    
     print("选择演示任务:")
     print("1. 基础工作流 - 待办事项管理器")
     print("2. 高级工作流 - 博客API系统")
-    
+
     choice = get_user_input("请选择 (1-2): ")
-    
-    if choice not in demo_tasks:
+
+    if choice not in DEMO_FACTORIES:
         print("❌ 无效选择")
         return
-    
-    demo = demo_tasks[choice]
-    
-    if demo["type"] == "basic":
-        workflow = ProgrammingWorkflow(config)
-        try:
-            await workflow.run_programming_task(demo["task"])
-        finally:
-            await workflow.close()
-    else:
-        workflow = AdvancedProgrammingWorkflow(config)
-        try:
-            await workflow.run_advanced_task(demo["task"])
-        finally:
-            await workflow.close()
+
+    # 只构建被选中的演示任务（对应的工作流模块也只在此时导入）；
+    # 工作流实例按类型做进程级缓存，重复演示不重建、退出时统一关闭
+    workflow_type, make_task = DEMO_FACTORIES[choice]
+    task = make_task()
+    workflow = _get_demo_workflow(workflow_type, config)
+
+    try:
+        if workflow_type == "basic":
+            await workflow.run_programming_task(task)
+        else:
+            await workflow.run_advanced_task(task)
+    except BaseException:
+        # 失败的运行已经关闭了模型客户端，逐出缓存实例，
+        # 下次演示重新构建而不是复用持有死连接的工作流
+        _evict_demo_workflow(workflow_type)
+        raise
 
 
 def main():
@@ -257,8 +377,9 @@ def main():
     
     args = parser.parse_args()
     
-    print("🌟 AutoGen编程工作流系统")
-    print("=" * 60)
+    # 横幅单次写出，减少stdio系统调用
+    sys.stdout.write("🌟 AutoGen编程工作流系统\n" + "=" * 60 + "\n")
+    sys.stdout.flush()
 
     # 检查配置
     config = check_config()
@@ -5,14 +5,38 @@ Gemini API快速设置脚本
 """
 
 import os
+import re
 import sys
 import shutil
 
+from dotenv import dotenv_values, set_key
+
+
+# Gemini API密钥的标准格式：AIza前缀加35位字符（模块级编译一次）
+_KEY_RE = re.compile(r"^AIza[0-9A-Za-z_-]{35}$")
+
+
+# 静态横幅预先拼接为单个字符串，输出时一次写出，
+# 减少stdio加锁与写系统调用次数
+_BANNER = "\n".join([
+    "🚀 AutoGen编程工作流 - Gemini API设置",
+    "=" * 60,
+]) + "\n"
+
+_NEXT_STEPS = "\n".join([
+    "",
+    "🎯 后续步骤:",
+    "1. 安装依赖: make install",
+    "2. 测试配置: make test-gemini",
+    "3. 运行演示: make run-demo",
+    "4. 查看文档: cat README.md",
+]) + "\n"
+
 
 def print_banner():
     """打印横幅"""
-    print("🚀 AutoGen编程工作流 - Gemini API设置")
-    print("=" * 60)
+    sys.stdout.write(_BANNER)
+    sys.stdout.flush()
 
 
 def check_env_example():
@@ -51,48 +75,33 @@ def get_gemini_api_key():
     
     while True:
         api_key = input("请输入您的Gemini API密钥: ").strip()
-        if api_key:
-            if api_key.startswith("AIza"):
-                return api_key
-            else:
-                print("⚠️  Gemini API密钥通常以'AIza'开头，请检查是否正确")
-                response = input("是否继续使用此密钥？(y/N): ").strip().lower()
-                if response == 'y':
-                    return api_key
-        else:
+        if not api_key:
             print("❌ API密钥不能为空")
+            continue
+
+        # 单次正则匹配完成格式校验（比仅检查前缀更严格）
+        if _KEY_RE.fullmatch(api_key):
+            return api_key
+
+        print("⚠️  Gemini API密钥通常是'AIza'开头的39位字符串，请检查是否正确")
+        response = input("是否继续使用此密钥？(y/N): ").strip().lower()
+        if response == 'y':
+            return api_key
 
 
 def update_env_file(api_key):
     """更新.env文件"""
     try:
-        # 读取.env文件
-        with open(".env", "r", encoding="utf-8") as f:
-            content = f.read()
-        
-        # 更新配置
-        lines = content.split('\n')
-        updated_lines = []
-        
-        for line in lines:
-            if line.startswith("API_PROVIDER="):
-                updated_lines.append("API_PROVIDER=gemini")
-            elif line.startswith("GEMINI_API_KEY="):
-                updated_lines.append(f"GEMINI_API_KEY={api_key}")
-            elif line.startswith("DEFAULT_MODEL="):
-                updated_lines.append("DEFAULT_MODEL=gemini-pro")
-            elif line.startswith("# GEMINI_API_KEY="):
-                updated_lines.append(f"GEMINI_API_KEY={api_key}")
-            else:
-                updated_lines.append(line)
-        
-        # 写回文件
-        with open(".env", "w", encoding="utf-8") as f:
-            f.write('\n'.join(updated_lines))
-        
+        # dotenv解析一次并原位改写目标键，不再逐行扫描重写全文
+        # quote_mode="never"保持.env.example那样的裸值格式，
+        # 避免写出API_PROVIDER='gemini'这类带引号的行
+        set_key(".env", "API_PROVIDER", "gemini", quote_mode="never")
+        set_key(".env", "GEMINI_API_KEY", api_key, quote_mode="never")
+        set_key(".env", "DEFAULT_MODEL", "gemini-pro", quote_mode="never")
+
         print("✅ .env文件更新成功")
         return True
-        
+
     except Exception as e:
         print(f"❌ 更新.env文件失败: {e}")
         return False
@@ -100,49 +109,52 @@ def update_env_file(api_key):
 
 def show_configuration():
     """显示当前配置"""
-    print("\n📋 当前配置:")
-    print("-" * 30)
-    
+    parts = ["\n📋 当前配置:", "-" * 30]
+
     try:
-        with open(".env", "r", encoding="utf-8") as f:
-            content = f.read()
-        
-        for line in content.split('\n'):
-            if line.startswith("API_PROVIDER="):
-                print(f"API提供商: {line.split('=', 1)[1]}")
-            elif line.startswith("GEMINI_API_KEY="):
-                key = line.split('=', 1)[1]
-                if key:
-                    print(f"Gemini API密钥: {key[:20]}...")
-                else:
-                    print("Gemini API密钥: 未设置")
-            elif line.startswith("DEFAULT_MODEL="):
-                print(f"默认模型: {line.split('=', 1)[1]}")
-    
+        # 一次解析为字典，按键直接取值
+        values = dotenv_values(".env")
+
+        parts.append(f"API提供商: {values.get('API_PROVIDER', '未设置')}")
+
+        key = values.get("GEMINI_API_KEY")
+        if key:
+            parts.append(f"Gemini API密钥: {key[:20]}...")
+        else:
+            parts.append("Gemini API密钥: 未设置")
+
+        parts.append(f"默认模型: {values.get('DEFAULT_MODEL', '未设置')}")
+
     except Exception as e:
-        print(f"❌ 读取配置失败: {e}")
+        parts.append(f"❌ 读取配置失败: {e}")
+
+    # 拼接后单次写出
+    sys.stdout.write("\n".join(parts) + "\n")
+    sys.stdout.flush()
 
 
 def test_configuration():
     """测试配置"""
     print("\n🧪 测试配置...")
-    
+
     try:
-        # 尝试导入并测试
-        import subprocess
-        result = subprocess.run([
-            sys.executable, "test_gemini_config.py"
-        ], capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
+        # 在当前进程内导入并运行测试，避免为一次异步测试
+        # 再启动一个完整的Python解释器并重复导入全部依赖
+        import asyncio
+        import test_gemini_config
+
+        ok = asyncio.run(
+            asyncio.wait_for(test_gemini_config.test_gemini_basic(), timeout=30)
+        )
+
+        if ok:
             print("✅ 配置测试通过")
             return True
         else:
             print("❌ 配置测试失败")
-            print(result.stderr)
             return False
-            
-    except subprocess.TimeoutExpired:
+
+    except asyncio.TimeoutError:
         print("⏰ 测试超时")
         return False
     except Exception as e:
@@ -152,11 +164,8 @@ def test_configuration():
 
 def show_next_steps():
     """显示后续步骤"""
-    print("\n🎯 后续步骤:")
-    print("1. 安装依赖: make install")
-    print("2. 测试配置: make test-gemini")
-    print("3. 运行演示: make run-demo")
-    print("4. 查看文档: cat README.md")
+    sys.stdout.write(_NEXT_STEPS)
+    sys.stdout.flush()
 
 
 def main():
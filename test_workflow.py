@@ -6,6 +6,7 @@ AutoGen编程工作流测试文件
 import asyncio
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from unittest.mock import AsyncMock, MagicMock
 import pytest
 
@@ -15,11 +16,23 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from autogen_programming_workflow import ProgrammingWorkflow, ProgrammingTask
 from autogen_advanced_programming_workflow import AdvancedProgrammingWorkflow, AdvancedProgrammingTask
 from config import get_model_config, get_agent_config, get_workflow_config
+from env_config import EnvironmentConfig
+
+
+def _make_test_config() -> EnvironmentConfig:
+    """构建单元测试用的配置（注入模拟API密钥）"""
+    os.environ.setdefault("OPENAI_API_KEY", "test-key")
+    return EnvironmentConfig()
 
 
 class TestProgrammingWorkflow:
     """基础编程工作流测试类"""
-    
+
+    @classmethod
+    def setup_class(cls):
+        """类级fixture：工作流只构建一次，供本类所有测试共享"""
+        cls.workflow = ProgrammingWorkflow(_make_test_config())
+
     def test_programming_task_creation(self):
         """测试编程任务创建"""
         task = ProgrammingTask(
@@ -34,38 +47,54 @@ class TestProgrammingWorkflow:
     
     def test_workflow_initialization(self):
         """测试工作流初始化"""
-        # 使用模拟的API密钥进行测试
-        workflow = ProgrammingWorkflow(
-            model_name="gpt-4o",
-            api_key="test-key"
-        )
-        
+        workflow = self.workflow
+
         assert workflow.code_writer.name == "CodeWriter"
-        assert workflow.code_reviewer.name == "CodeReviewer" 
+        assert workflow.code_reviewer.name == "CodeReviewer"
         assert workflow.code_optimizer.name == "CodeOptimizer"
         assert workflow.team is not None
-    
+
+    @staticmethod
+    def _system_text(agent) -> str:
+        """读取Agent实际装配的系统提示文本
+
+        AssistantAgent没有公开的system_message访问器，
+        构造后的系统提示保存在_system_messages里
+        """
+        return agent._system_messages[0].content
+
     def test_agent_system_messages(self):
         """测试Agent系统消息配置"""
-        workflow = ProgrammingWorkflow(api_key="test-key")
-        
+        workflow = self.workflow
+
         # 检查系统消息是否包含关键词
-        writer_msg = workflow.code_writer.system_message
+        writer_msg = self._system_text(workflow.code_writer)
         assert "代码编写专家" in writer_msg
         assert "高质量" in writer_msg
-        
-        reviewer_msg = workflow.code_reviewer.system_message
+
+        reviewer_msg = self._system_text(workflow.code_reviewer)
         assert "审阅专家" in reviewer_msg
         assert "改进建议" in reviewer_msg
-        
-        optimizer_msg = workflow.code_optimizer.system_message
+
+        optimizer_msg = self._system_text(workflow.code_optimizer)
         assert "优化专家" in optimizer_msg
         assert "OPTIMIZATION_COMPLETE" in optimizer_msg
 
+    def run_all(self):
+        """依次运行本类的全部测试"""
+        self.test_programming_task_creation()
+        self.test_workflow_initialization()
+        self.test_agent_system_messages()
+
 
 class TestAdvancedProgrammingWorkflow:
     """高级编程工作流测试类"""
-    
+
+    @classmethod
+    def setup_class(cls):
+        """类级fixture：高级工作流（6个Agent）只构建一次"""
+        cls.workflow = AdvancedProgrammingWorkflow(_make_test_config())
+
     def test_advanced_task_creation(self):
         """测试高级编程任务创建"""
         task = AdvancedProgrammingTask(
@@ -84,8 +113,8 @@ class TestAdvancedProgrammingWorkflow:
     
     def test_advanced_workflow_initialization(self):
         """测试高级工作流初始化"""
-        workflow = AdvancedProgrammingWorkflow(api_key="test-key")
-        
+        workflow = self.workflow
+
         # 检查所有Agent是否正确创建
         expected_agents = [
             "code_writer", "code_reviewer", "security_analyzer",
@@ -99,8 +128,8 @@ class TestAdvancedProgrammingWorkflow:
     
     def test_workflow_graph_structure(self):
         """测试工作流图结构"""
-        workflow = AdvancedProgrammingWorkflow(api_key="test-key")
-        
+        workflow = self.workflow
+
         # 验证图流包含所有参与者
         participants = workflow.graph_flow.participants
         assert len(participants) == 6
@@ -115,6 +144,50 @@ class TestAdvancedProgrammingWorkflow:
         for name in expected_names:
             assert name in agent_names
 
+    def run_all(self):
+        """依次运行本类的全部测试"""
+        self.test_advanced_task_creation()
+        self.test_advanced_workflow_initialization()
+        self.test_workflow_graph_structure()
+
+
+class TestWorkflowGraphExecution:
+    """工作流图执行测试类（回放客户端，不发真实API请求）"""
+
+    @staticmethod
+    async def _spoken_agents(reply: str):
+        """用固定回复回放整个图执行，返回发言过的Agent名称集合"""
+        from autogen_ext.models.replay import ReplayChatCompletionClient
+
+        workflow = AdvancedProgrammingWorkflow(_make_test_config())
+        # 在惰性创建Agent之前换成回放客户端；所有Agent被调度时
+        # 都取到同一条预设回复，使审阅结果与并行调度顺序无关
+        workflow.model_client = ReplayChatCompletionClient([reply] * 12)
+        spoken = set()
+        try:
+            async for event in workflow.graph_flow.run_stream(task="编写一个加法函数"):
+                source = getattr(event, "source", None)
+                if source is not None:
+                    spoken.add(source)
+        finally:
+            await workflow.model_client.close()
+        return spoken
+
+    def test_final_validator_runs_when_approved(self):
+        """审阅通过（APPROVE直达）路径下FinalValidator要收尾"""
+        spoken = asyncio.run(self._spoken_agents("代码质量良好 APPROVE"))
+        assert "FinalValidator" in spoken
+
+    def test_final_validator_runs_when_not_approved(self):
+        """审阅不通过（走优化路径）时FinalValidator同样收尾"""
+        spoken = asyncio.run(self._spoken_agents("发现若干问题，需要修改"))
+        assert "FinalValidator" in spoken
+
+    def run_all(self):
+        """依次运行本类的全部测试"""
+        self.test_final_validator_runs_when_approved()
+        self.test_final_validator_runs_when_not_approved()
+
 
 class TestConfiguration:
     """配置测试类"""
@@ -152,6 +225,12 @@ class TestConfiguration:
         assert advanced_config.max_messages == 25
         assert advanced_config.enable_parallel_processing
 
+    def run_all(self):
+        """依次运行本类的全部测试"""
+        self.test_model_config()
+        self.test_agent_config()
+        self.test_workflow_config()
+
 
 class TestTaskExecution:
     """任务执行测试类（需要真实API密钥）"""
@@ -211,32 +290,36 @@ class TestTaskExecution:
             await workflow.close()
 
 
+def _run_test_class(test_cls):
+    """实例化测试类并运行其全部测试
+
+    模块级定义保证可以被pickle后发送到工作进程；
+    有类级fixture的先执行setup_class再跑测试方法
+    """
+    setup = getattr(test_cls, "setup_class", None)
+    if setup is not None:
+        setup()
+    test_cls().run_all()
+    return test_cls.__name__
+
+
 def run_unit_tests():
     """运行单元测试"""
     print("🧪 运行AutoGen编程工作流单元测试")
     print("=" * 50)
-    
-    # 基础测试
-    test_basic = TestProgrammingWorkflow()
-    test_basic.test_programming_task_creation()
-    test_basic.test_workflow_initialization()
-    test_basic.test_agent_system_messages()
-    print("✅ 基础工作流测试通过")
-    
-    # 高级测试
-    test_advanced = TestAdvancedProgrammingWorkflow()
-    test_advanced.test_advanced_task_creation()
-    test_advanced.test_advanced_workflow_initialization()
-    test_advanced.test_workflow_graph_structure()
-    print("✅ 高级工作流测试通过")
-    
-    # 配置测试
-    test_config = TestConfiguration()
-    test_config.test_model_config()
-    test_config.test_agent_config()
-    test_config.test_workflow_config()
-    print("✅ 配置测试通过")
-    
+
+    # 各测试类互不共享状态，分发到独立进程并行执行；
+    # executor.map按顺序返回结果，子进程的异常会在此处重新抛出
+    test_classes = [
+        TestProgrammingWorkflow,
+        TestAdvancedProgrammingWorkflow,
+        TestWorkflowGraphExecution,
+        TestConfiguration,
+    ]
+    with ProcessPoolExecutor(max_workers=len(test_classes)) as executor:
+        for class_name in executor.map(_run_test_class, test_classes):
+            print(f"✅ {class_name} 测试通过")
+
     print("\n🎉 所有单元测试通过！")
 
 
@@ -4,202 +4,455 @@ AutoGen编程工作流配置验证脚本
 用于验证.env配置文件的正确性
 """
 
+import functools
+import hashlib
+import importlib.util
+import json
+from importlib.metadata import PackageNotFoundError, distribution, distributions
+import io
 import sys
 import os
-from pathlib import Path
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-try:
-    from env_config import get_config, EnvironmentConfig
-except ImportError:
-    print("❌ 无法导入env_config模块，请确保文件存在")
-    sys.exit(1)
+# env_config在main()内惰性导入：测试工具或其他脚本只为枚举
+# 检查函数而导入本模块时，不必拉起整个配置加载栈
+
+
+# 静态横幅在模块导入时一次性编码为字节串，输出时直接写入
+# 底层二进制缓冲，绕过TextIOWrapper的逐次编码路径
+_BANNER = ("🔍 AutoGen编程工作流配置验证\n" + "=" * 60 + "\n").encode("utf-8")
+
+# 两个配置文件路径（模块级常量；EAFP路径直接传给open，
+# 不再构造pathlib.Path对象）
+_ENV_FILE = '.env'
+_ENV_EXAMPLE = '.env.example'
+
+# 布尔值 -> 标签的查表（按bool索引，替代逐处的条件表达式）。
+# 中文字面量不会被解释器自动驻留，显式intern让反复调用
+# （REPL循环、watch模式的Makefile目标）共享同一批字符串对象
+_BOOL_LABELS = tuple(sys.intern(s) for s in ('禁用', '启用'))
+_YES_NO = tuple(sys.intern(s) for s in ('否', '是'))
+
+
+# 配置摘要的完整模板在模块导入时拼装一次：标签全部是常量，
+# 每次调用只做一趟format_map填值和一次写出；可选行
+# （基础URL、日志文件、缓存过期）以整行字段占位，未设置时为空串
+_SUMMARY_TEMPLATE = (
+    "\n📋 配置摘要:\n"
+    + "=" * 50 + "\n"
+    "🤖 API配置:\n"
+    "  提供商: {provider}\n"
+    "  模型: {model}\n"
+    "  温度: {temperature}\n"
+    "  超时: {timeout}秒\n"
+    "{base_url_line}"
+    "\n⚙️  工作流配置:\n"
+    "  基础工作流最大消息数: {basic_max_messages}\n"
+    "  高级工作流最大消息数: {advanced_max_messages}\n"
+    "  并行处理: {parallel}\n"
+    "  消息过滤: {filtering}\n"
+    "  安全分析: {security}\n"
+    "  性能优化: {performance}\n"
+    "\n📁 项目配置:\n"
+    "  项目名称: {project_name}\n"
+    "  版本: {project_version}\n"
+    "  默认语言: {default_language}\n"
+    "  结果目录: {results_dir}\n"
+    "  调试模式: {debug_mode}\n"
+    "  保存中间结果: {save_intermediate}\n"
+    "\n📝 日志配置:\n"
+    "  日志级别: {log_level}\n"
+    "  详细日志: {verbose}\n"
+    "  彩色输出: {color}\n"
+    "{log_file_line}"
+    "\n💾 缓存配置:\n"
+    "  启用缓存: {cache_enabled}\n"
+    "{cache_expiry_line}"
+    + "=" * 50 + "\n"
+)
+
+
+# 检查路径上可预期的失败类型（缺字段、坏值、文件缺失等）；
+# 真正意外的异常不再被吞掉，而是带完整回溯向上抛出
+_EXPECTED_ERRORS = (AttributeError, KeyError, ValueError, FileNotFoundError)
+
+
+# 验证结论缓存：指纹一致时跳过整套检查
+_VALIDATE_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "autogen-workflow", "validate.json"
+)
+
+
+def _config_fingerprint() -> str:
+    """计算本次验证输入的指纹
+
+    整套验证的结果由(.env内容, Python版本, 已安装发行版集合)
+    唯一决定；三者的哈希一致即可复用上次的成功结论，
+    任一变化（编辑配置、装卸包、换解释器）都会自动失效
+    """
+    try:
+        with open(_ENV_FILE, "rb") as f:
+            env_bytes = f.read()
+    except OSError:
+        env_bytes = b""
+
+    dists = sorted(
+        f"{d.metadata['Name']}=={d.version}" for d in distributions()
+    )
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(env_bytes)
+    digest.update(sys.version.encode("utf-8"))
+    digest.update("\n".join(dists).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_cached_verdict():
+    """读取上次验证的缓存结论，不存在或损坏时返回None"""
+    try:
+        with open(_VALIDATE_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached_verdict(fingerprint: str):
+    """记录一次成功验证的指纹（尽力而为）"""
+    try:
+        os.makedirs(os.path.dirname(_VALIDATE_CACHE_PATH), exist_ok=True)
+        with open(_VALIDATE_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump({"fp": fingerprint, "ok": True}, f)
+    except OSError:
+        pass
+
+
+def _guarded(label):
+    """把各检查函数重复的try/except脚手架集中到一个装饰器
+
+    被装饰的函数只写主路径逻辑；可预期的异常统一在此打印
+    并判定失败，意外异常继续传播以便暴露真实缺陷
+
+    Args:
+        label: 失败消息中的检查名称
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            except _EXPECTED_ERRORS as e:
+                print(f"❌ {label}失败: {e}")
+                return False
+        return wrapper
+    return decorator
 
 
 def check_env_file():
     """检查.env文件是否存在"""
-    env_file = Path(".env")
-    env_example = Path(".env.example")
-    
     print("🔍 检查配置文件...")
-    
-    if not env_file.exists():
+
+    # EAFP：直接尝试打开而不是先检查存在性——成功路径只花
+    # 一次open系统调用，也消除了检查与使用之间的竞态窗口；
+    # 只有失败路径才需要再看.env.example给出对应提示
+    try:
+        open(_ENV_FILE, 'rb').close()
+    except FileNotFoundError:
         print("❌ .env文件不存在")
-        if env_example.exists():
+        if os.path.exists(_ENV_EXAMPLE):
             print("💡 建议运行: make setup-env 或 cp .env.example .env")
         else:
             print("💡 请创建.env文件并设置必要的配置")
         return False
-    
+
     print("✅ .env文件存在")
     return True
 
 
-def validate_configuration():
-    """验证配置"""
-    try:
-        print("\n🔧 加载配置...")
-        config = get_config()
-        
-        print("✅ 配置加载成功")
-        
-        print("\n🔍 验证配置...")
-        errors = config.validate_config()
-        
-        if errors:
-            print("❌ 配置验证失败:")
-            for error in errors:
-                print(f"  - {error}")
-            return False
-        
-        print("✅ 配置验证通过")
-        return True
-        
-    except Exception as e:
-        print(f"❌ 配置验证失败: {e}")
+@_guarded("配置验证")
+def validate_configuration(config):
+    """验证配置
+
+    Args:
+        config: 已加载的EnvironmentConfig实例（由main统一加载）
+    """
+    print("\n🔍 验证配置...")
+    errors = config.validate_config()
+
+    if errors:
+        # 错误列表拼接后单次写出，条数再多也只有一次write
+        sys.stdout.write(
+            "❌ 配置验证失败:\n"
+            + "\n".join(f"  - {error}" for error in errors)
+            + "\n"
+        )
+        sys.stdout.flush()
         return False
 
+    print("✅ 配置验证通过")
+    return True
 
-def print_config_summary():
-    """打印配置摘要"""
-    try:
-        config = get_config()
-        
-        print("\n📋 配置摘要:")
-        print("=" * 50)
-        
-        # OpenAI配置
-        print("🤖 OpenAI配置:")
-        print(f"  模型: {config.openai.model}")
-        print(f"  温度: {config.openai.temperature}")
-        print(f"  超时: {config.openai.timeout}秒")
-        if config.openai.base_url:
-            print(f"  基础URL: {config.openai.base_url}")
-        
-        # 工作流配置
-        print("\n⚙️  工作流配置:")
-        print(f"  基础工作流最大消息数: {config.workflow.basic_max_messages}")
-        print(f"  高级工作流最大消息数: {config.workflow.advanced_max_messages}")
-        print(f"  并行处理: {'启用' if config.workflow.enable_parallel_processing else '禁用'}")
-        print(f"  消息过滤: {'启用' if config.workflow.enable_message_filtering else '禁用'}")
-        print(f"  安全分析: {'启用' if config.workflow.enable_security_analysis else '禁用'}")
-        print(f"  性能优化: {'启用' if config.workflow.enable_performance_optimization else '禁用'}")
-        
-        # 项目配置
-        print("\n📁 项目配置:")
-        print(f"  项目名称: {config.project.name}")
-        print(f"  版本: {config.project.version}")
-        print(f"  默认语言: {config.project.default_language}")
-        print(f"  结果目录: {config.project.results_dir}")
-        print(f"  调试模式: {'启用' if config.project.debug_mode else '禁用'}")
-        print(f"  保存中间结果: {'启用' if config.project.save_intermediate_results else '禁用'}")
-        
-        # 日志配置
-        print("\n📝 日志配置:")
-        print(f"  日志级别: {config.logging.level}")
-        print(f"  详细日志: {'启用' if config.logging.verbose else '禁用'}")
-        print(f"  彩色输出: {'启用' if config.logging.enable_color else '禁用'}")
-        if config.logging.file_path:
-            print(f"  日志文件: {config.logging.file_path}")
-        
-        # 缓存配置
-        print("\n💾 缓存配置:")
-        print(f"  启用缓存: {'是' if config.cache.enable_cache else '否'}")
-        if config.cache.enable_cache:
-            print(f"  过期时间: {config.cache.expiry_hours}小时")
-        
-        print("=" * 50)
-        
-    except Exception as e:
-        print(f"❌ 无法打印配置摘要: {e}")
-
-
-def check_api_connectivity():
-    """检查API连接性"""
-    try:
-        print("\n🌐 检查API连接性...")
-        
-        config = get_config()
-        
-        # 这里可以添加实际的API连接测试
-        # 为了避免消耗API配额，这里只做基本检查
-        
-        if not config.openai.api_key:
-            print("❌ API密钥未设置")
-            return False
-        
-        if not config.openai.api_key.startswith('sk-'):
-            print("⚠️  API密钥格式可能不正确（应以'sk-'开头）")
-        
-        print("✅ API配置看起来正确")
-        print("💡 实际连接性需要在运行工作流时验证")
-        return True
-        
-    except Exception as e:
-        print(f"❌ API连接性检查失败: {e}")
+
+@_guarded("配置摘要打印")
+def print_config_summary(config):
+    """打印配置摘要
+
+    Args:
+        config: 已加载的EnvironmentConfig实例
+    """
+    # 标签已在模块级模板中定型，这里只填动态值：
+    # 一趟format_map、一次编码、一次写出
+    values = {
+        "provider": config.api.provider,
+        "model": config.api.model,
+        "temperature": config.api.temperature,
+        "timeout": config.api.timeout,
+        "base_url_line": (
+            f"  基础URL: {config.api.base_url}\n" if config.api.base_url else ""
+        ),
+        "basic_max_messages": config.workflow.basic_max_messages,
+        "advanced_max_messages": config.workflow.advanced_max_messages,
+        "parallel": _BOOL_LABELS[config.workflow.enable_parallel_processing],
+        "filtering": _BOOL_LABELS[config.workflow.enable_message_filtering],
+        "security": _BOOL_LABELS[config.workflow.enable_security_analysis],
+        "performance": _BOOL_LABELS[config.workflow.enable_performance_optimization],
+        "project_name": config.project.name,
+        "project_version": config.project.version,
+        "default_language": config.project.default_language,
+        "results_dir": config.project.results_dir,
+        "debug_mode": _BOOL_LABELS[config.project.debug_mode],
+        "save_intermediate": _BOOL_LABELS[config.project.save_intermediate_results],
+        "log_level": config.logging.level,
+        "verbose": _BOOL_LABELS[config.logging.verbose],
+        "color": _BOOL_LABELS[config.logging.enable_color],
+        "log_file_line": (
+            f"  日志文件: {config.logging.file_path}\n"
+            if config.logging.file_path else ""
+        ),
+        "cache_enabled": _YES_NO[config.cache.enable_cache],
+        "cache_expiry_line": (
+            f"  过期时间: {config.cache.expiry_hours}小时\n"
+            if config.cache.enable_cache else ""
+        ),
+    }
+
+    sys.stdout.buffer.write(_SUMMARY_TEMPLATE.format_map(values).encode("utf-8"))
+    sys.stdout.flush()
+
+
+@_guarded("API连接性检查")
+def check_api_connectivity(config=None):
+    """检查API连接性
+
+    Args:
+        config: 已加载的EnvironmentConfig实例；为None时走环境变量
+            快捷路径——密钥是否存在只是两个键宽的问题，独立调用
+            时不必为此构建整棵配置对象图
+    """
+    print("\n🌐 检查API连接性...")
+
+    # 这里可以添加实际的API连接测试
+    # 为了避免消耗API配额，这里只做基本检查
+
+    if config is not None:
+        provider = config.api.provider
+        key = config.api.api_key
+    else:
+        provider = os.environ.get('API_PROVIDER', 'openai').lower()
+        key = os.environ.get(
+            'GEMINI_API_KEY' if provider == 'gemini' else 'OPENAI_API_KEY'
+        )
+
+    if not key:
+        print("❌ API密钥未设置")
         return False
 
+    if provider == "openai":
+        # 长度为3的前缀用切片比较（紧凑unicode快径），
+        # 不走通用的startswith扫描机制
+        if key[:3] != 'sk-':
+            print("⚠️  API密钥格式可能不正确（应以'sk-'开头）")
+        elif len(key) < 40:
+            # 长度下限检查：截断的密钥在真正调用API前就能发现
+            print("⚠️  API密钥长度异常，可能在复制时被截断")
+
+    print("✅ API配置看起来正确")
+    print("💡 实际连接性需要在运行工作流时验证")
+    return True
+
+
+# 必需依赖的导入名（python-dotenv的导入名是dotenv）
+REQUIRED_PACKAGES = (
+    'autogen_agentchat',
+    'autogen_core',
+    'autogen_ext',
+    'openai',
+    'dotenv',
+)
+
+# 导入名 -> pip发行版名，用于元数据查询与安装提示
+PIP_NAMES = {
+    'autogen_agentchat': 'autogen-agentchat',
+    'autogen_core': 'autogen-core',
+    'autogen_ext': 'autogen-ext',
+    'dotenv': 'python-dotenv',
+}
+
 
 def check_dependencies():
     """检查依赖包"""
     print("\n📦 检查依赖包...")
-    
-    required_packages = [
-        'autogen_agentchat',
-        'autogen_core', 
-        'autogen_ext',
-        'openai',
-        'python_dotenv'
-    ]
-    
+
     missing_packages = []
-    
-    for package in required_packages:
+
+    for package in REQUIRED_PACKAGES:
+        # 两级探测，均不执行模块代码：先查发行版元数据
+        # （只读RECORD/METADATA，最廉价也最准确），元数据缺失时
+        # （如直接放进sys.path的本地包）退回find_spec的路径解析
         try:
-            __import__(package.replace('_', '-'))
+            distribution(PIP_NAMES.get(package, package))
+            found = True
+        except PackageNotFoundError:
+            found = importlib.util.find_spec(package) is not None
+
+        if found:
             print(f"✅ {package}")
-        except ImportError:
+        else:
             print(f"❌ {package} - 未安装")
             missing_packages.append(package)
-    
+
     if missing_packages:
-        print(f"\n💡 请安装缺失的包: pip install {' '.join(missing_packages)}")
+        pip_names = ' '.join(PIP_NAMES.get(p, p) for p in missing_packages)
+        print(f"\n💡 请安装缺失的包: pip install {pip_names}")
         print("或运行: make install")
         return False
-    
+
     print("✅ 所有依赖包已安装")
     return True
 
 
+class _ThreadLocalStdout:
+    """线程本地的stdout代理
+
+    并发执行的检查把输出写进各自线程的缓冲区，主线程在全部
+    完成后按固定顺序整体写出——既能并行执行又不会交错输出。
+    未注册缓冲区的线程（主线程自身）直接透传到原stdout
+    """
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def push_buffer(self) -> io.StringIO:
+        """为当前线程注册一个新的输出缓冲区"""
+        buf = io.StringIO()
+        self._local.buffer = buf
+        return buf
+
+    def pop_buffer(self):
+        """注销当前线程的输出缓冲区"""
+        self._local.buffer = None
+
+    def _target(self):
+        return getattr(self._local, "buffer", None) or self._fallback
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        target = self._target()
+        if target is self._fallback:
+            target.flush()
+
+
+def _run_captured(proxy, fn, args):
+    """在线程本地缓冲中运行一项检查，返回(结果, 输出文本)"""
+    buf = proxy.push_buffer()
+    try:
+        return fn(*args), buf.getvalue()
+    finally:
+        proxy.pop_buffer()
+
+
 def main():
     """主函数"""
-    print("🔍 AutoGen编程工作流配置验证")
-    print("=" * 60)
-    
-    success = True
-    
-    # 检查.env文件
+    sys.stdout.buffer.write(_BANNER)
+    sys.stdout.flush()
+
+    # 指纹与上次成功验证一致说明配置和环境都未变化，
+    # 直接复用结论——Makefile前置目标或CI钩子的重复调用
+    # 退化为一次哈希比较
+    fingerprint = _config_fingerprint()
+    cached = _read_cached_verdict()
+    if cached is not None and cached.get("fp") == fingerprint and cached.get("ok"):
+        print("⏭️  配置与环境自上次验证以来未变化，复用缓存结论")
+        print("🎉 所有检查通过！系统已准备就绪")
+        print("💡 可以运行: make run-demo 开始使用")
+        return 0
+
+    try:
+        from env_config import get_config
+    except ImportError:
+        print("❌ 无法导入env_config模块，请确保文件存在")
+        return 1
+
+    # 廉价的前置检查失败时立即返回：.env缺失意味着后续
+    # 配置验证的结果已经确定，不再为注定失败的步骤付出成本
     if not check_env_file():
+        print("\n" + "=" * 60)
+        print("❌ 存在配置问题，请修复后重试")
+        print("💡 运行 make setup-env 创建配置文件")
+        return 1
+
+    success = True
+
+    # 配置只加载一次（get_config本身带mtime缓存），
+    # 后续的验证、连接性检查和摘要打印共享同一个实例
+    try:
+        print("\n🔧 加载配置...")
+        config = get_config()
+        print("✅ 配置加载成功")
+    except (OSError, ValueError, TypeError) as e:
+        print(f"❌ 配置加载失败: {e}")
+        config = None
         success = False
-    
-    # 检查依赖包
-    if not check_dependencies():
-        success = False
-    
-    # 验证配置
-    if not validate_configuration():
-        success = False
-    
-    # 检查API连接性
-    if not check_api_connectivity():
-        success = False
-    
+
+    # 剩余检查相互独立且以I/O为主（文件stat、模块路径解析），
+    # 放入线程池并发执行，墙钟时间取决于最慢一项而非各项之和；
+    # 输出经线程本地缓冲收集，完成后按固定顺序写出
+    checks = []
+    if config is not None:
+        checks.append((validate_configuration, (config,)))
+        checks.append((check_api_connectivity, (config,)))
+    checks.append((check_dependencies, ()))
+
+    proxy = _ThreadLocalStdout(sys.stdout)
+    original_stdout, sys.stdout = sys.stdout, proxy
+    try:
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = [
+                executor.submit(_run_captured, proxy, fn, args)
+                for fn, args in checks
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        sys.stdout = original_stdout
+
+    # 输出按提交顺序一次写出；结论对已物化的结果列表做一次
+    # all()聚合——每项检查都已执行（无短路），新增检查只需
+    # 在checks里加一项
+    sys.stdout.write("".join(output for _, output in results))
+    success = success and all(ok for ok, _ in results)
+
     # 打印配置摘要
     if success:
-        print_config_summary()
+        print_config_summary(config)
     
     print("\n" + "=" * 60)
     
     if success:
+        # 记录本次指纹，下次输入未变时直接复用结论
+        _write_cached_verdict(fingerprint)
         print("🎉 所有检查通过！系统已准备就绪")
         print("💡 可以运行: make run-demo 开始使用")
     else: